@@ -0,0 +1,40 @@
+import pytest
+from django.core.cache import cache
+
+from core.query_budget import assert_query_budget
+from posts.models import Comment, Follow, Post
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_pages_budget(self, mixer, user_client, user, another_user,
+                               group):
+        mixer.blend(Follow, user=user, author=another_user)
+        mixer.cycle(20).blend(Post, author=another_user, group=group, image='')
+        post = Post.objects.first()
+        urls = [
+            '/',
+            f'/group/{post.group.slug}/',
+            f'/profile/{post.author.username}/',
+            '/follow/',
+        ]
+        for url in urls:
+            cache.clear()
+            with assert_query_budget(url):
+                response = user_client.get(url)
+            assert response.status_code == 200, (
+                f'Страница `{url}` работает неправильно'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_detail_budget(self, user_client, mixer, user):
+        post = mixer.blend(Post, author=user, image='')
+        mixer.cycle(20).blend(Comment, post=post)
+        url = f'/posts/{post.id}/'
+        with assert_query_budget(url):
+            response = user_client.get(url)
+        assert len(response.context['comments']) == 20, (
+            'Проверьте, что на странице `/posts/<post_id>/` '
+            'выводится первая страница комментариев поста'
+        )
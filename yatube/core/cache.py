@@ -0,0 +1,107 @@
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+VERSION_KEY = 'version:{}'
+
+
+def _initial_version() -> int:
+    # Evicted version starts from a new value, so stale entries stay unused.
+    return time.time_ns()
+
+
+def get_version(name: str) -> int:
+    """Current version of a cached namespace."""
+    return cache.get_or_set(
+        VERSION_KEY.format(name), _initial_version,
+        settings.VERSION_CACHE_TIMEOUT,
+    )
+
+
+def get_versions(names) -> dict:
+    """Current versions of several namespaces in one cache round-trip."""
+    keys = {VERSION_KEY.format(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, settings.VERSION_CACHE_TIMEOUT)
+        found.update(missing)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def bump_version(name: str) -> None:
+    """Invalidate everything cached under a namespace.
+
+    A version is the time of the last change in nanoseconds, so it also
+    tells when the namespace was modified.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key) or 0
+    cache.set(
+        key, max(_initial_version(), version + 1),
+        settings.VERSION_CACHE_TIMEOUT,
+    )
+
+
+def version_time(version: int) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(
+        version / 10 ** 9, tz=datetime.timezone.utc
+    )
+
+
+def versioned_cache_page(timeout: int, key_prefix: str):
+    """``cache_page`` whose keys change on every ``bump_version``."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            prefix = f'{key_prefix}.{get_version(key_prefix)}'
+            cached_view = cache_page(timeout, key_prefix=prefix)(view)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def versioned_condition(namespaces, state=None):
+    """Answer ``304`` while the namespaces of a view are unchanged.
+
+    ``namespaces(request, *args, **kwargs)`` returns names the response
+    depends on, their versions give ``ETag`` and ``Last-Modified``.
+    ``state`` with the same arguments may add data that has no
+    namespace to the ``ETag``. For a request with a session, the session
+    and the CSRF cookie are part of it too: a page kept by the browser
+    must not outlive the login or the CSRF token of its forms.
+    """
+    def versions(request, *args, **kwargs) -> dict:
+        if not hasattr(request, 'namespace_versions'):
+            request.namespace_versions = get_versions(
+                namespaces(request, *args, **kwargs)
+            )
+        return request.namespace_versions
+
+    def etag(request, *args, **kwargs) -> str:
+        data = [
+            request.get_full_path(),
+            sorted(versions(request, *args, **kwargs).items()),
+        ]
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if session:
+            # Sets the cookie now if it is missing, so the next request
+            # sends the same one.
+            get_token(request)
+            data += [session, request.META['CSRF_COOKIE']]
+        if state is not None:
+            data.append(state(request, *args, **kwargs))
+        data = repr(data).encode()
+        return hashlib.md5(data).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return version_time(max(versions(request, *args, **kwargs).values()))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,105 @@
+import json
+import random
+import shutil
+import tempfile
+import time
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'tiered': 'core.tiered_cache.TieredCache',
+}
+
+
+def run_worker(backend: str, location: str, workload: dict, seed: int):
+    """Read keys picked by a power law, write back misses and a share
+    of reads; return operations, hits and seconds spent."""
+    cache = import_string(BACKENDS[backend])(location, {
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': workload['keys'] * 2},
+    })
+    rng = random.Random(seed)
+    value = b'x' * workload['value_size']
+    keys = workload['keys']
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(workload['operations']):
+        key = f'key:{int(keys ** rng.random())}'
+        if cache.get(key) is not None:
+            hits += 1
+            if rng.random() >= workload['write_ratio']:
+                continue
+        cache.set(key, value)
+    return workload['operations'], hits, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput and hit rate of cache backends used by '
+            'several processes at once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                            default=list(BACKENDS))
+        parser.add_argument('--processes', nargs='+', type=int,
+                            default=[1, 4, 16])
+        parser.add_argument('--operations', type=int, default=20000,
+                            help='Operations of every process.')
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=2000)
+        parser.add_argument('--write-ratio', type=float, default=0.02,
+                            help='Share of hits written again.')
+        parser.add_argument('--output', help='File to save results to.')
+
+    def handle(self, *args, **options):
+        workload = {
+            key: options[key] for key in (
+                'operations', 'keys', 'value_size', 'write_ratio'
+            )
+        }
+        self.stdout.write(
+            f'{"backend":<12}{"processes":>10}{"ops/s":>12}'
+            f'{"hit rate":>10}{"us/op":>9}'
+        )
+        results = []
+        for backend in options['backends']:
+            for processes in options['processes']:
+                result = self.measure(backend, processes, workload)
+                results.append(result)
+                self.stdout.write(
+                    f'{backend:<12}{processes:>10}'
+                    f'{result["ops_per_second"]:>12.0f}'
+                    f'{result["hit_rate"]:>10.3f}'
+                    f'{result["us_per_operation"]:>9.1f}'
+                )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(
+                    {'workload': workload, 'results': results}, file,
+                    indent=2,
+                )
+
+    def measure(self, backend: str, processes: int, workload: dict):
+        location = tempfile.mkdtemp(prefix='cache-benchmark-')
+        try:
+            with get_context('fork').Pool(processes) as pool:
+                stats = pool.starmap(run_worker, [
+                    (backend, location, workload, seed)
+                    for seed in range(processes)
+                ])
+        finally:
+            shutil.rmtree(location, ignore_errors=True)
+        operations = sum(operations for operations, _, _ in stats)
+        hits = sum(hits for _, hits, _ in stats)
+        seconds = max(seconds for _, _, seconds in stats)
+        busy = sum(seconds for _, _, seconds in stats)
+        return {
+            'backend': backend,
+            'processes': processes,
+            'ops_per_second': operations / seconds,
+            'hit_rate': hits / operations,
+            'us_per_operation': busy / operations * 10 ** 6,
+        }
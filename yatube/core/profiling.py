@@ -0,0 +1,203 @@
+"""Profile of SQL, template rendering and cache use of sampled requests."""
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('profile', default=None)
+
+MISSING = object()
+
+
+class Profile:
+    """Timings and counters of a single request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.timings = defaultdict(float)
+        self.depth = defaultdict(int)
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @contextmanager
+    def measure(self, name: str):
+        """Add time of the block to ``name``, nested blocks count once."""
+        self.depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[name] -= 1
+            if not self.depth[name]:
+                self.timings[name] += time.perf_counter() - started
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper."""
+        self.queries += 1
+        with self.measure('db'):
+            return execute(sql, params, many, context)
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self.started
+
+    def milliseconds(self) -> dict:
+        return {
+            name: round(seconds * 1000, 1)
+            for name, seconds in self.timings.items()
+        }
+
+    def server_timing(self) -> str:
+        descriptions = {
+            'db': f'{self.queries} queries',
+            'cache': f'{self.cache_hits} hits, {self.cache_misses} misses',
+        }
+        metrics = [
+            f'{name};dur={duration}'
+            + (f';desc="{descriptions[name]}"' if name in descriptions else '')
+            for name, duration in self.milliseconds().items()
+        ]
+        if not self.queries:
+            metrics.append(f'db;desc="{descriptions["db"]}"')
+        metrics.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def record(self, request, response) -> dict:
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(self.total * 1000, 1),
+            'queries': self.queries,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            **{
+                f'{name}_ms': duration
+                for name, duration in self.milliseconds().items()
+            },
+        }
+
+
+@contextmanager
+def span(name: str):
+    """Time the block as ``name`` if the request is profiled.
+
+    Works as a decorator as well.
+    """
+    profile = current.get()
+    if profile is None:
+        yield
+        return
+    with profile.measure(name):
+        yield
+
+
+def _profiled_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        profile = current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        with profile.measure('template'):
+            return render(self, *args, **kwargs)
+    return wrapper
+
+
+def _profiled_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        profile = current.get()
+        if profile is None or profile.depth['cache']:
+            return get(self, key, default, version)
+        with profile.measure('cache'):
+            value = get(self, key, MISSING, version)
+        if value is MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _profiled_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        profile = current.get()
+        if profile is None or profile.depth['cache']:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        with profile.measure('cache'):
+            values = get_many(self, keys, version)
+        profile.cache_hits += len(values)
+        profile.cache_misses += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def install() -> None:
+    """Wrap template rendering and reads of configured cache backends.
+
+    Wrappers only check a context variable on requests that are not
+    profiled.
+    """
+    hooks = [(Template, 'render', _profiled_render)]
+    for options in settings.CACHES.values():
+        backend = import_string(options['BACKEND'])
+        hooks += [
+            (backend, 'get', _profiled_get),
+            (backend, 'get_many', _profiled_get_many),
+        ]
+    for owner, name, hook in hooks:
+        method = getattr(owner, name)
+        if not getattr(method, 'profiled', False):
+            wrapper = hook(method)
+            wrapper.profiled = True
+            setattr(owner, name, wrapper)
+
+
+class ProfilingMiddleware:
+    """Profile a sampled share of requests.
+
+    ``PROFILING_SAMPLE_RATE`` of requests get a ``Server-Timing`` header
+    and a JSON line in the ``core.profiling`` log. The middleware is off
+    with the default rate of 0.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        profile = Profile()
+        token = current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        profile.finish()
+        response['Server-Timing'] = profile.server_timing()
+        logger.info(json.dumps(profile.record(request, response)))
+        return response
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+
+def query_budget(queries: int):
+    """Set the maximum amount of SQL queries a view may run."""
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def budget_for(path: str) -> int:
+    """Query budget of the view serving ``path``."""
+    match = resolve(path.split('?')[0])
+    budget = getattr(match.func, 'query_budget', None)
+    assert budget is not None, (
+        f'View `{match.view_name}` has no query budget, '
+        'decorate it with `query_budget`'
+    )
+    return budget
+
+
+@contextmanager
+def assert_query_budget(path: str):
+    """Fail if the block runs more queries than the view of ``path``
+    is allowed to."""
+    budget = budget_for(path)
+    with CaptureQueriesContext(connection) as context:
+        yield context
+    queries = '\n'.join(query['sql'] for query in context.captured_queries)
+    assert len(context) <= budget, (
+        f'{path} made {len(context)} queries, budget is {budget}:\n{queries}'
+    )
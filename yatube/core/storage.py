@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 2 ** 10
+
+
+def content_hash(content) -> str:
+    """SHA-256 of a file, which is left rewound."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the hash of their content.
+
+    ``posts/photo.JPG`` is saved as ``posts/ab/ab12…ef.jpg``; a file
+    with the same content is stored once and never overwritten.
+    """
+
+    def hashed_name(self, name: str, content) -> str:
+        directory = os.path.dirname(name)
+        if self.is_hashed(name):
+            directory = os.path.dirname(directory)
+        extension = os.path.splitext(name)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def is_hashed(self, name: str) -> bool:
+        stem = os.path.splitext(os.path.basename(name))[0]
+        parent = os.path.basename(os.path.dirname(name))
+        return len(stem) == 64 and stem.startswith(parent)
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name or content.name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,50 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='background',
+        )
+    return _executor
+
+
+def _call(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Background task %s failed', function.__name__)
+
+
+def _run(function, *args):
+    close_old_connections()
+    try:
+        _call(function, *args)
+    finally:
+        close_old_connections()
+
+
+def enqueue(function, *args) -> None:
+    """Run a function in a background worker after the transaction commits.
+
+    Jobs live only in memory, ones queued when the process stops are
+    lost; ``process_images`` picks up images left unprocessed. With
+    ``BACKGROUND_WORKERS = 0``, the default of tests, the function runs
+    at once in the current thread.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        _call(function, *args)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, function, *args)
+    )
@@ -1,4 +1,16 @@
-from django.test import Client, TestCase
+import json
+import shutil
+import tempfile
+from io import StringIO
+from multiprocessing import get_context
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .cache import get_version
+from .tiered_cache import TieredCache
 
 
 class CoreTemplatesCheck(TestCase):
@@ -13,3 +25,121 @@ class CoreTemplatesCheck(TestCase):
             with self.subTest(url=url):
                 response = self.client.get(url)
                 self.assertTemplateUsed(response, template)
+
+
+class ProfilingTest(TestCase):
+    def get_index(self):
+        cache.clear()
+        return Client().get(reverse('posts:index'))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_profiled_request(self):
+        """Sampled request gets Server-Timing header and a log line."""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            response = self.get_index()
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('template;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+
+    def test_profiling_is_off_by_default(self):
+        """Without a sample rate responses have no Server-Timing."""
+        self.assertNotIn('Server-Timing', self.get_index())
+
+
+class VersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(VERSION_CACHE_TIMEOUT=None)
+    def test_version_is_kept(self):
+        """A shared cache keeps a version until it is bumped."""
+        self.assertEqual(get_version('page'), get_version('page'))
+
+    @override_settings(VERSION_CACHE_TIMEOUT=0)
+    def test_version_expires(self):
+        """An expired version is replaced, dropping what was cached."""
+        self.assertNotEqual(get_version('page'), get_version('page'))
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = self.create_cache()
+
+    def create_cache(self):
+        return TieredCache(self.location, {
+            'OPTIONS': {
+                'MAX_ENTRIES': 10, 'CULL_INTERVAL': 5,
+                'LOCAL_MAX_ENTRIES': 2,
+            },
+        })
+
+    def test_operations(self):
+        """Backend follows the cache API."""
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('number', 1))
+        self.assertEqual(cache.incr('number', 2), 3)
+        self.assertEqual(
+            cache.get_many(['key', 'number', 'missing']),
+            {'key': {'value': 1}, 'number': 3},
+        )
+        cache.set('expired', 1, -1)
+        self.assertIsNone(cache.get('expired'))
+        self.assertFalse(cache.has_key('expired'))
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        cache.clear()
+        self.assertFalse(cache.has_key('number'))
+
+    def test_local_tier_is_bounded(self):
+        """Values evicted from the local LRU come from the shared store."""
+        for number in range(5):
+            self.cache.set(f'key{number}', number)
+        self.assertLessEqual(len(self.cache._local.entries), 2)
+        self.assertEqual(self.cache.get('key0'), 0)
+        for number in range(20):
+            self.cache.set(f'other{number}', number)
+        self.assertLessEqual(self.cache._count(), 10 + 5)
+        self.cache.set('other20', 20)
+        self.assertGreater(self.cache._count(), 10)
+        for number in range(21, 25):
+            self.cache.set(f'other{number}', number)
+        self.assertLessEqual(self.cache._count(), 10)
+
+    def test_change_is_seen_by_other_processes(self):
+        """A write of another process invalidates the local copy."""
+        self.cache.set('key', 'old')
+        self.assertEqual(self.cache.get('key'), 'old')
+        process = get_context('fork').Process(
+            target=lambda: self.create_cache().set('key', 'new')
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('key'), 'new')
+        process = get_context('fork').Process(
+            target=lambda: self.create_cache().clear()
+        )
+        process.start()
+        process.join()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_benchmark_cache(self):
+        """Benchmark reports every backend for every amount of processes."""
+        output = StringIO()
+        call_command(
+            'benchmark_cache', processes=[1, 2], operations=50, keys=10,
+            stdout=output,
+        )
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 1 + 3 * 2)
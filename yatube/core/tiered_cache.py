@@ -0,0 +1,328 @@
+"""Cache shared by worker processes with a small local LRU in front.
+
+Entries live in a SQLite file of ``LOCATION``, every process also keeps
+up to ``LOCAL_MAX_ENTRIES`` recently used of them in memory. A memory
+mapped file holds generations: a write of a key bumps the generation of
+its slot, ``clear()`` bumps the global one. A local entry is used only
+while both generations it was read under are current, so every process
+sees a change as soon as it is written.
+
+Entries are counted and culled once per ``CULL_INTERVAL`` writes of a
+process, outside the write lock unless there is anything to delete, so
+the store may hold up to ``MAX_ENTRIES + CULL_INTERVAL`` entries.
+"""
+import fcntl
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SLOTS = 4096
+GENERATION = struct.Struct('Q')
+# SQLite limits the amount of parameters of a statement.
+MAX_PARAMS = 900
+
+_generations = {}
+_local_stores = {}
+_setup_lock = threading.Lock()
+
+
+def _expired(expires) -> bool:
+    return expires is not None and expires <= time.time()
+
+
+class Generations:
+    """Counters in a memory mapped file, visible to all processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        size = GENERATION.size * (SLOTS + 1)
+        fd = self._open()
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self.map = mmap.mmap(fd, size)
+        self.lock = threading.Lock()
+
+    def _open(self) -> int:
+        """Descriptor of the current process.
+
+        A forked process gets a descriptor of its own, shared ones hold
+        the same ``flock``.
+        """
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.pid = os.getpid()
+        return self.fd
+
+    @staticmethod
+    def slot(key: str) -> int:
+        return zlib.crc32(key.encode()) % SLOTS + 1
+
+    def _value(self, slot: int) -> int:
+        return GENERATION.unpack_from(self.map, slot * GENERATION.size)[0]
+
+    def read(self, slot: int) -> tuple:
+        """Global generation and the one of a slot."""
+        return self._value(0), self._value(slot)
+
+    def bump(self, slot: int) -> None:
+        """Change a generation; call within ``writing()``."""
+        GENERATION.pack_into(
+            self.map, slot * GENERATION.size, self._value(slot) + 1
+        )
+
+    @contextmanager
+    def writing(self):
+        """Exclusive lock among threads and processes."""
+        with self.lock:
+            fd = self.fd if self.pid == os.getpid() else self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class LocalStore:
+    """Bounded LRU of pickled values tagged with their generations."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str, generation: tuple):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            pickled, expires, stored = entry
+            if stored != generation or _expired(expires):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return pickled
+
+    def set(self, key: str, pickled: bytes, expires, generation: tuple):
+        with self.lock:
+            self.entries[key] = (pickled, expires, generation)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        os.makedirs(location, exist_ok=True)
+        location = os.path.abspath(location)
+        self._path = os.path.join(location, 'cache.sqlite3')
+        with _setup_lock:
+            if location not in _generations:
+                _generations[location] = Generations(
+                    os.path.join(location, 'generations')
+                )
+                _local_stores[location] = LocalStore(
+                    int(options.get('LOCAL_MAX_ENTRIES', 1000))
+                )
+        self._generations = _generations[location]
+        self._local = _local_stores[location]
+        self._cull_interval = int(options.get('CULL_INTERVAL', 100))
+        self._writes = 0
+        self._connection = None
+        self._pid = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Connection of the current process."""
+        if self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def _key(self, key, version) -> str:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _generation(self, key: str) -> tuple:
+        return self._generations.read(self._generations.slot(key))
+
+    def _row(self, key: str):
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or _expired(row[1]):
+            return None
+        return row
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        # Read the generation first: a concurrent write bumps it after
+        # storing the value, so a stale local copy can not outlive it.
+        generation = self._generation(key)
+        pickled = self._local.get(key, generation)
+        if pickled is None:
+            row = self._row(key)
+            if row is None:
+                return default
+            pickled = row[0]
+            self._local.set(key, pickled, row[1], generation)
+        return pickle.loads(pickled)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        generations = {key: self._generation(key) for key in keys}
+        found = {}
+        for key in keys:
+            pickled = self._local.get(key, generations[key])
+            if pickled is not None:
+                found[key] = pickled
+        missing = iter([key for key in keys if key not in found])
+        while True:
+            chunk = list(islice(missing, MAX_PARAMS))
+            if not chunk:
+                break
+            rows = self._db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))})',
+                chunk,
+            )
+            for key, pickled, expires in rows:
+                if not _expired(expires):
+                    found[key] = pickled
+                    self._local.set(key, pickled, expires, generations[key])
+        return {
+            keys[key]: pickle.loads(pickled)
+            for key, pickled in found.items()
+        }
+
+    def _store(self, key: str, pickled: bytes, expires) -> None:
+        """Write a value and its local copy; call within ``writing()``."""
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, pickled, expires),
+        )
+        self._writes += 1
+        slot = self._generations.slot(key)
+        self._generations.bump(slot)
+        self._local.set(
+            key, pickled, expires, self._generations.read(slot)
+        )
+
+    def _written(self) -> None:
+        """Cull after every ``CULL_INTERVAL`` writes; call after
+        ``writing()``."""
+        if self._writes < self._cull_interval:
+            return
+        self._writes = 0
+        self._cull()
+
+    def _count(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def _cull(self) -> None:
+        if self._count() <= self._max_entries:
+            return
+        db = self._db
+        with self._generations.writing():
+            db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count = self._count()
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                db.execute('DELETE FROM cache')
+                return
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._generations.writing():
+            self._store(key, pickled, self.get_backend_timeout(timeout))
+        self._written()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._generations.writing():
+            if self._row(key) is not None:
+                return False
+            self._store(key, pickled, self.get_backend_timeout(timeout))
+        self._written()
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._generations.writing():
+            row = self._row(key)
+            if row is None:
+                return False
+            self._store(key, row[0], self.get_backend_timeout(timeout))
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._generations.writing():
+            row = self._row(key)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            self._store(
+                key, pickle.dumps(value, self.pickle_protocol), row[1]
+            )
+        self._written()
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        if self._local.get(key, self._generation(key)) is not None:
+            return True
+        return self._row(key) is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._generations.writing():
+            self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+            self._generations.bump(self._generations.slot(key))
+            self._local.delete(key)
+
+    def clear(self):
+        with self._generations.writing():
+            self._db.execute('DELETE FROM cache')
+            self._generations.bump(0)
+            self._local.clear()
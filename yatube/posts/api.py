@@ -0,0 +1,140 @@
+from functools import wraps
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.cache import versioned_condition
+from core.query_budget import query_budget
+
+from .images import resolve_thumbnails
+from .models import Group, Post, User
+from .signals import INDEX_PAGE
+from .utils import comment_page, page_counter
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'processed_image', 'comments_count',
+    'author', 'author__username', 'group', 'group__slug',
+)
+
+
+def feed_namespaces(request, *args, **kwargs) -> list:
+    # Any change of posts, groups, comments or authors bumps the index.
+    return [INDEX_PAGE]
+
+
+def follow_namespaces(request, *args, **kwargs) -> list:
+    return [INDEX_PAGE, f'timeline:{request.user.pk}']
+
+
+def post_list():
+    return Post.objects.select_related('author', 'group').only(*POST_FIELDS)
+
+
+def serialize_post(post) -> dict:
+    thumbnail = post.thumbnails.get('card') if post.image else None
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'thumbnail': thumbnail.url if thumbnail else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def serialize_comment(comment) -> dict:
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': comment.author.username,
+    }
+
+
+def cursor_url(request, cursor):
+    return f'{request.path}?cursor={cursor}' if cursor else None
+
+
+def json_response(data: dict, status: int = 200) -> JsonResponse:
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def api_login_required(view):
+    """Answer 403 with a JSON error to anonymous users, not a redirect."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': 'Учетные данные не были предоставлены.'},
+                status=403,
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def feed_response(request, posts, **options) -> JsonResponse:
+    """Page of a feed with links to the neighbouring pages."""
+    page = page_counter(request, posts, **options)
+    resolve_thumbnails(page)
+    return json_response({
+        'results': [serialize_post(post) for post in page],
+        'next': cursor_url(request, page.next_cursor),
+        'previous': cursor_url(request, page.previous_cursor),
+    })
+
+
+@query_budget(2)
+@versioned_condition(feed_namespaces)
+def index(request) -> JsonResponse:
+    """Latest posts."""
+    return feed_response(request, post_list())
+
+
+@query_budget(3)
+@versioned_condition(feed_namespaces)
+def group_posts(request, slug: str) -> JsonResponse:
+    """Posts of a group."""
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return feed_response(request, post_list().filter(group=group))
+
+
+@query_budget(3)
+@versioned_condition(feed_namespaces)
+def profile(request, username: str) -> JsonResponse:
+    """Posts of an author."""
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return feed_response(request, post_list().filter(author=author))
+
+
+@query_budget(4)
+@api_login_required
+@versioned_condition(follow_namespaces)
+def follow_index(request) -> JsonResponse:
+    """Posts of favorite authors."""
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
+    ).only(
+        'user', 'pub_date', 'post',
+        *(f'post__{field}' for field in POST_FIELDS),
+    )
+    return feed_response(
+        request, entries, keys=('pub_date', 'post_id'), related='post'
+    )
+
+
+@query_budget(3)
+@versioned_condition(feed_namespaces)
+def post_detail(request, post_id: int) -> JsonResponse:
+    """A post with a page of its comments."""
+    post = get_object_or_404(post_list(), pk=post_id)
+    resolve_thumbnails([post])
+    comments = comment_page(request, post)
+    return json_response({
+        'post': serialize_post(post),
+        'comments': [serialize_comment(comment) for comment in comments],
+        'next': cursor_url(request, comments.next_cursor),
+    })
@@ -0,0 +1,88 @@
+"""Latency, query and size measurements of every view of ``posts.urls``."""
+import time
+from contextlib import nullcontext
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import urls
+from .models import Group, Post, User
+
+PERCENTILES = (50, 95, 99)
+
+# Views that change data even on ``GET``.
+MUTATING_VIEWS = ('profile_follow', 'profile_unfollow')
+
+
+def percentile(values: list, percent: int) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, -(-percent * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def sample_kwargs() -> dict:
+    """URL arguments pointing to the heaviest objects of the dataset."""
+    post = Post.objects.select_related('author').order_by(
+        '-comments_count'
+    ).first()
+    group = Group.objects.order_by('pk').first()
+    return {
+        'post_id': post.pk,
+        'username': post.author.username,
+        'slug': group.slug,
+    }
+
+
+def view_urls(kwargs: dict) -> list:
+    """``(name, url)`` of every pattern of ``posts.urls``."""
+    return [
+        (pattern.name, reverse(f'{urls.app_name}:{pattern.name}', kwargs={
+            name: kwargs[name] for name in pattern.pattern.converters
+        }))
+        for pattern in urls.urlpatterns
+    ]
+
+
+def measure(client, url: str, repeat: int, rollback: bool = False) -> dict:
+    """Request a URL ``repeat`` times; with ``rollback`` every request
+    runs in a transaction that is rolled back, so it changes nothing."""
+    timings, queries = [], []
+    for _ in range(repeat):
+        with transaction.atomic() if rollback else nullcontext():
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            if rollback:
+                transaction.set_rollback(True)
+        queries.append(len(context))
+    result = {
+        'url': url,
+        'status': response.status_code,
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': max(queries),
+        'bytes': len(response.content),
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(percentile(timings, percent), 3)
+    return result
+
+
+def run(repeat: int = 20, read_only: bool = False) -> dict:
+    """Measure views as the user following the most authors.
+
+    Views changing data are requested with ``GET`` as well, so they show
+    the cost of their forms and redirects. ``MUTATING_VIEWS`` run in
+    rolled back transactions, ``read_only`` skips them altogether.
+    """
+    user = User.objects.order_by('-stats__following_count', 'pk').first()
+    client = Client()
+    client.force_login(user)
+    return {
+        name: measure(client, url, repeat, rollback=name in MUTATING_VIEWS)
+        for name, url in view_urls(sample_kwargs())
+        if not (read_only and name in MUTATING_VIEWS)
+    }
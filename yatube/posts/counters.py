@@ -0,0 +1,91 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def stats_of(user) -> UserStats:
+    """Counters of a user, zero ones if users were inserted in bulk and
+    not reconciled yet."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _added(field: str, delta: int):
+    """``field + delta``, never below zero: a drifted counter must not
+    break the ``CHECK`` constraint of a positive field."""
+    return Greatest(F(field) + delta, 0)
+
+
+def add_to_user(user_id: int, field: str, delta: int) -> None:
+    """Atomically change a counter of ``UserStats``."""
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: _added(field, delta)}
+    )
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(
+            **{field: _added(field, delta)}
+        )
+
+
+def add_to_post(post_id: int, delta: int) -> None:
+    """Atomically change the comments counter of a post."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_added('comments_count', delta)
+    )
+
+
+def _count(queryset, field: str):
+    """Correlated ``COUNT`` of ``queryset`` rows by ``field``."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile_users(start: int, stop: int) -> int:
+    """Recompute counters of users with ``start <= pk < stop``."""
+    users = User.objects.filter(pk__gte=start, pk__lt=stop).annotate(
+        posts_total=_count(Post.objects, 'author'),
+        followers_total=_count(Follow.objects, 'author'),
+        following_total=_count(Follow.objects, 'user'),
+    ).values_list(
+        'pk', 'posts_total', 'followers_total', 'following_total'
+    )
+    stats = [
+        UserStats(
+            user_id=pk,
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        ) for pk, posts, followers, following in users
+    ]
+    existing = set(UserStats.objects.filter(
+        user_id__gte=start, user_id__lt=stop
+    ).values_list('user_id', flat=True))
+    UserStats.objects.bulk_update(
+        [item for item in stats if item.user_id in existing],
+        ['posts_count', 'followers_count', 'following_count'],
+    )
+    UserStats.objects.bulk_create(
+        [item for item in stats if item.user_id not in existing]
+    )
+    return len(stats)
+
+
+def reconcile_posts(start: int, stop: int) -> int:
+    """Recompute comment counters of posts with ``start <= pk < stop``."""
+    posts = list(Post.objects.filter(pk__gte=start, pk__lt=stop).annotate(
+        comments_total=_count(Comment.objects, 'post'),
+    ).only('pk', 'comments_count'))
+    changed = [
+        post for post in posts if post.comments_count != post.comments_total
+    ]
+    for post in changed:
+        post.comments_count = post.comments_total
+    Post.objects.bulk_update(changed, ['comments_count'])
+    return len(posts)
@@ -37,3 +37,22 @@ class CommentForm(forms.ModelForm):
                 'blank': 'Текст комментария не может быть пустым.',
             }
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(
+        label='Запрос',
+        max_length=200,
+        required=False,
+    )
+    group = forms.SlugField(
+        label='Группа',
+        required=False,
+        help_text='Адрес группы',
+    )
+    author = forms.CharField(
+        label='Автор',
+        max_length=150,
+        required=False,
+        help_text='Имя пользователя',
+    )
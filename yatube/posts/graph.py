@@ -0,0 +1,88 @@
+"""Follower counters and follows of users kept in the cache.
+
+Entries are filled on first use. Follow signals shift counters in
+place and drop the follows of the user, so a profile needs one cache
+round trip to show counters and the follow button. Other processes see
+these changes only through a shared cache, without one entries live
+for a short ``GRAPH_CACHE_TIMEOUT``.
+"""
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .counters import stats_of
+from .models import Follow
+
+FOLLOWERS = 'graph:followers:{}'
+FOLLOWING = 'graph:following:{}'
+FOLLOWS = 'graph:follows:{}'
+
+
+class Node(NamedTuple):
+    followers: int
+    following: int
+    followed: bool
+
+
+def load_follows(user_id: int) -> frozenset:
+    return frozenset(Follow.objects.filter(
+        user_id=user_id, author__isnull=False,
+    ).values_list('author_id', flat=True))
+
+
+def lookup(author, viewer_id: int = None) -> Node:
+    """Counters of an author and whether a viewer follows them.
+
+    Missing counters are taken from the stats of the author, missing follows
+    of the viewer are loaded with one query.
+    """
+    keys = {
+        'followers': FOLLOWERS.format(author.pk),
+        'following': FOLLOWING.format(author.pk),
+    }
+    if viewer_id:
+        keys['follows'] = FOLLOWS.format(viewer_id)
+    found = cache.get_many(keys.values())
+    values = {name: found.get(key) for name, key in keys.items()}
+    missing = {}
+    for name in ('followers', 'following'):
+        if values[name] is None:
+            values[name] = getattr(stats_of(author), f'{name}_count')
+            missing[keys[name]] = values[name]
+    if viewer_id and values['follows'] is None:
+        values['follows'] = load_follows(viewer_id)
+        missing[keys['follows']] = values['follows']
+    if missing:
+        cache.set_many(missing, settings.GRAPH_CACHE_TIMEOUT)
+    return Node(
+        values['followers'],
+        values['following'],
+        author.pk in values.get('follows', ()),
+    )
+
+
+def _shift(key: str, delta: int) -> None:
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Not cached, the next lookup loads the current value.
+        pass
+
+
+def _forget_follows(user_id: int) -> None:
+    # Rewriting the set would lose concurrent changes, the next lookup
+    # loads it with one query.
+    cache.delete(FOLLOWS.format(user_id))
+
+
+def followed(user_id: int, author_id: int) -> None:
+    _shift(FOLLOWERS.format(author_id), 1)
+    _shift(FOLLOWING.format(user_id), 1)
+    _forget_follows(user_id)
+
+
+def unfollowed(user_id: int, author_id: int) -> None:
+    _shift(FOLLOWERS.format(author_id), -1)
+    _shift(FOLLOWING.format(user_id), -1)
+    _forget_follows(user_id)
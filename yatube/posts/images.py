@@ -0,0 +1,206 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.cache import bump_version
+from core.profiling import span
+
+from .models import Post
+from .thumbnails import backend
+
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+RGB_FORMATS = ('JPEG',)
+
+
+def variant_formats() -> list:
+    """``(extension, format)`` of variants this Pillow build can write."""
+    extensions = Image.registered_extensions()
+    formats = []
+    for extension in settings.POST_IMAGE_VARIANTS:
+        image_format = extensions.get(f'.{extension}')
+        if image_format in Image.SAVE:
+            formats.append((extension, image_format))
+    return formats
+
+
+def variant_name(name: str, extension: str) -> str:
+    return f'{name}.{extension}'
+
+
+def _open(storage, name: str) -> Image.Image:
+    with storage.open(name) as file:
+        return Image.open(BytesIO(file.read()))
+
+
+def _encode(image, image_format: str) -> ContentFile:
+    """Compress an image without any metadata of the source."""
+    if image_format in RGB_FORMATS and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+    content = BytesIO()
+    image.save(
+        content, format=image_format,
+        quality=settings.POST_IMAGE_QUALITY, optimize=True,
+    )
+    return ContentFile(content.getvalue())
+
+
+def process_original(name: str) -> str:
+    """Apply the EXIF orientation, cap dimensions and drop metadata.
+
+    Return the name of the processed copy; animated images are kept as
+    they are.
+    """
+    image = _open(IMAGE_STORAGE, name)
+    if getattr(image, 'is_animated', False):
+        return name
+    image_format = image.format
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(settings.POST_IMAGE_MAX_SIZE)
+    return IMAGE_STORAGE.save(name, _encode(image, image_format))
+
+
+def create_variants(storage, name: str, force: bool = False) -> None:
+    """Save compressed copies of an image in every variant format."""
+    formats = [
+        (variant_name(name, extension), image_format)
+        for extension, image_format in variant_formats()
+    ]
+    if not force:
+        formats = [
+            (variant, image_format) for variant, image_format in formats
+            if not storage.exists(variant)
+        ]
+    if not formats:
+        return
+    image = _open(storage, name)
+    for variant, image_format in formats:
+        storage.delete(variant)
+        storage.save(variant, _encode(image, image_format))
+
+
+def _source(name: str) -> ImageFile:
+    # Names of thumbnails depend on the storage of the source as well.
+    return ImageFile(name, IMAGE_STORAGE)
+
+
+def _thumbnails(name: str) -> list:
+    return [
+        backend.thumbnail(_source(name), alias)
+        for alias in settings.POST_THUMBNAILS
+    ]
+
+
+def create_derivatives(name: str, force: bool = False) -> None:
+    """Create thumbnails of an image and variants of all of them."""
+    # Variants keep the name of their source, not the hash of content.
+    create_variants(default_storage, name, force)
+    backend.generate(_source(name), force)
+    for thumbnail in _thumbnails(name):
+        create_variants(thumbnail.storage, thumbnail.name, force)
+
+
+def delete_derivatives(name: str) -> None:
+    """Delete thumbnails and variants created for an image."""
+    for file_ in [_source(name)] + _thumbnails(name):
+        for extension in settings.POST_IMAGE_VARIANTS:
+            file_.storage.delete(variant_name(file_.name, extension))
+    default.kvstore.delete_thumbnails(_source(name))
+    default.kvstore.delete(_source(name))
+
+
+def replace_image(old: str, new: str) -> None:
+    """Point posts from one image to another and delete the old file."""
+    posts = list(Post.objects.filter(image=old).values_list('pk', flat=True))
+    Post.objects.filter(pk__in=posts).update(image=new)
+    Post.objects.filter(pk__in=posts, processed_image=old).update(
+        processed_image=new
+    )
+    if old != new and not Post.objects.filter(image=old).exists():
+        IMAGE_STORAGE.delete(old)
+    for pk in posts:
+        bump_version(f'post:{pk}')
+
+
+def process_post_image(post_id: int, force: bool = False) -> None:
+    """Background task preparing an uploaded image for serving.
+
+    The original is shrunk and stored under the hash of the result, so
+    every post with an equal upload shares it along with its thumbnails
+    and their variants in modern formats.
+    """
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'processed_image'
+    ).first()
+    if post is None or not post.image:
+        return
+    name = post.image.name
+    if name != post.processed_image:
+        processed = process_original(name)
+    elif force:
+        processed = name
+    else:
+        return
+    create_derivatives(processed, force)
+    Post.objects.filter(image=name).update(processed_image=name)
+    replace_image(name, processed)
+
+
+@span('thumbnails')
+def resolve_thumbnails(posts) -> None:
+    """Find thumbnails of many posts with one key-value store lookup.
+
+    Sets ``post.thumbnails`` to registered thumbnails by alias; a post
+    that is not processed yet has none and shows the original image.
+    """
+    pending = []
+    for post in posts:
+        post.thumbnails = {}
+        if post.image and post.image.name == post.processed_image:
+            pending.extend(
+                (post, alias, backend.thumbnail(post.image, alias))
+                for alias in settings.POST_THUMBNAILS
+            )
+    stored = default.kvstore.get_many(
+        thumbnail for _, _, thumbnail in pending
+    )
+    for post, alias, thumbnail in pending:
+        if thumbnail.key in stored:
+            post.thumbnails[alias] = thumbnail
+
+
+def _thumbnail(post, alias: str):
+    if not hasattr(post, 'thumbnails'):
+        resolve_thumbnails([post])
+    return post.thumbnails.get(alias)
+
+
+def thumbnail_url(post, alias: str) -> str:
+    """Url of a thumbnail, the original image until it is ready."""
+    if not post.image:
+        return ''
+    thumbnail = _thumbnail(post, alias)
+    return thumbnail.url if thumbnail else post.image.url
+
+
+def thumbnail_sources(post, alias: str) -> list:
+    """Urls and types of the processed variants of a thumbnail."""
+    thumbnail = _thumbnail(post, alias) if post.image else None
+    if thumbnail is None:
+        return []
+    return [
+        {
+            'url': thumbnail.storage.url(
+                variant_name(thumbnail.name, extension)
+            ),
+            'type': Image.MIME[image_format],
+        }
+        for extension, image_format in variant_formats()
+    ]
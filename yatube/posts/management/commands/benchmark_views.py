@@ -0,0 +1,123 @@
+import datetime
+import json
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark, seeding
+from posts.transfer import bulk_command
+
+ISOLATED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Seed a dataset in a test database and measure latency, '
+            'queries and size of every posts view.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Authors followed by every user.')
+        parser.add_argument('--comments', type=int, default=2,
+                            help='Average amount of comments of a post.')
+        parser.add_argument('--heavy-comments', type=int, default=500,
+                            help='Comments of the comment-heavy post.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Requests to every view.')
+        parser.add_argument('--output', help='File to save results to.')
+        parser.add_argument('--baseline',
+                            help='Results of an earlier run to compare.')
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Measure the current database without seeding it; '
+                 'views changing data are skipped.',
+        )
+
+    @bulk_command
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key] for key in (
+                'posts', 'users', 'follows', 'comments', 'heavy_comments'
+            )
+        }
+        if options['existing']:
+            results = benchmark.run(options['repeat'], read_only=True)
+        else:
+            results = self.run_isolated(dataset, options['repeat'])
+        report = {
+            'commit': current_commit(),
+            'created': datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            'django': django.get_version(),
+            'dataset': None if options['existing'] else dataset,
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+        self.print_table(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+
+    def run_isolated(self, dataset: dict, repeat: int) -> dict:
+        """Seed and measure a throwaway test database.
+
+        A private cache replaces the configured one, so nothing of the
+        test data gets into a cache shared with the site.
+        """
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        with override_settings(CACHES=ISOLATED_CACHES):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                seeding.seed(
+                    posts=dataset['posts'],
+                    users=dataset['users'],
+                    follows=dataset['follows'],
+                    comments=dataset['comments'],
+                    heavy_comments=dataset['heavy_comments'],
+                )
+                return benchmark.run(repeat)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+    def print_table(self, results: dict, baseline: dict):
+        self.stdout.write(
+            f'{"view":<20}{"p50":>9}{"p95":>9}{"p99":>9}'
+            f'{"queries":>9}{"bytes":>9}'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<20}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                f'{result["p99_ms"]:>9.2f}{result["queries"]:>9}'
+                f'{result["bytes"]:>9}'
+            )
+            if name in baseline:
+                change = result['p95_ms'] / max(baseline[name]['p95_ms'], 1e-9)
+                line += f'  p95 x{change:.2f}'
+            self.stdout.write(line)
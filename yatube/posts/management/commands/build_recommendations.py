@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute "who to follow" suggestions from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=settings.RECOMMENDATIONS_TOP,
+            help='Suggestions saved for every user.',
+        )
+        parser.add_argument(
+            '--sample', type=int, default=settings.RECOMMENDATIONS_SAMPLE,
+            help='Followers and follows walked through for each author.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Users whose suggestions are saved in one transaction.',
+        )
+
+    def handle(self, *args, **options):
+        users = recommendations.build(
+            count=options['top'],
+            size=options['sample'],
+            chunk_size=options['chunk_size'],
+            report=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Suggestions rebuilt for {users} users'
+        ))
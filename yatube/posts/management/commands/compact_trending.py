@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Subtract activity that left trending windows from scores and '
+            'delete buckets older than the longest window. Run it hourly.')
+
+    def handle(self, *args, **options):
+        report = trending.compact()
+        deleted = report.pop('deleted')
+        changed = ', '.join(
+            f'{window} {count}' for window, count in report.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Scores changed: {changed}; buckets deleted: {deleted}'
+        ))
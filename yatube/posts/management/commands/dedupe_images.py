@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import (IMAGE_STORAGE, create_derivatives,
+                          delete_derivatives, replace_image)
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Rename images of posts by content hash, keeping one copy.'
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        renamed = failed = 0
+        for name in list(names):
+            if IMAGE_STORAGE.is_hashed(name):
+                continue
+            try:
+                with IMAGE_STORAGE.open(name) as file:
+                    hashed = IMAGE_STORAGE.save(name, file)
+                processed = Post.objects.filter(
+                    image=name, processed_image=name
+                ).exists()
+                if processed:
+                    create_derivatives(hashed)
+                delete_derivatives(name)
+                replace_image(name, hashed)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                renamed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Images renamed: {renamed}, failed: {failed}'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import DEFAULT_CHUNK_SIZE, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream groups, users, posts, comments and follows as JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='File to write, standard output by default.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Amount of rows read from the database at once.',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        stream = (
+            self.stdout if output == '-'
+            else open(output, 'w', encoding='utf-8')
+        )
+        rows = 0
+        try:
+            for line in export_rows(options['chunk_size']):
+                stream.write(line + '\n')
+                rows += 1
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        self.stderr.write(f'Rows exported: {rows}')
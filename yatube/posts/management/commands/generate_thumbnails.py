@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import create_derivatives
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Create missing thumbnails of images of existing posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Recreate thumbnails that already exist.',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        done = failed = 0
+        for name in names.iterator():
+            try:
+                create_derivatives(name, options['force'])
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Images with thumbnails: {done}, failed: {failed}'
+        ))
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import bump_version
+from posts.signals import INDEX_PAGE
+from posts.transfer import (
+    DEFAULT_CHUNK_SIZE, Importer, TargetNotEmpty, bulk_command,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import JSONL made by export_posts with batched inserts. Posts '
+        'keep their ids, so the database must have no posts yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', help='File to read, "-" for standard input.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Amount of rows inserted in one query.',
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Do not recompute counters and timelines afterwards.',
+        )
+
+    @bulk_command
+    def handle(self, *args, **options):
+        stream = (
+            sys.stdin if options['input'] == '-'
+            else open(options['input'], encoding='utf-8')
+        )
+        importer = Importer(options['chunk_size'], report=self.stdout.write)
+        try:
+            counts = importer.run(stream)
+        except TargetNotEmpty as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        if not options['skip_derived']:
+            # Inserts in bulk send no signals.
+            call_command('reconcile_counters', stdout=self.stdout)
+            call_command('rebuild_timelines', stdout=self.stdout)
+        bump_version(INDEX_PAGE)
+        self.stdout.write(self.style.SUCCESS(
+            'Rows imported: ' + ', '.join(
+                f'{kind} {count}' for kind, count in counts.items()
+            )
+        ))
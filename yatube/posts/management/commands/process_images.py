@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts.images import process_post_image
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Shrink images of existing posts and create their variants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Process images that were already processed.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['force']:
+            posts = posts.exclude(processed_image=F('image'))
+        processed = failed = 0
+        for post_id in posts.values_list('pk', flat=True).iterator():
+            try:
+                process_post_image(post_id, options['force'])
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Post {post_id}: {error}')
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Images processed: {processed}, failed: {failed}'
+        ))
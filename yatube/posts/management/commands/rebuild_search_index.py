@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text index of posts.'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Full-text index needs an SQLite database.')
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild follow timelines from the Follow table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Rebuild only timelines of these users.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=timeline.BATCH_SIZE,
+            help='Amount of timelines rebuilt in one query.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            pk__in=Follow.objects.values('user_id')
+        ).order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        total = 0
+        chunk = []
+        for user_id in users.values_list('pk', flat=True).iterator():
+            chunk.append(user_id)
+            if len(chunk) >= options['chunk_size']:
+                total += timeline.rebuild(*chunk)
+                chunk = []
+        if chunk:
+            total += timeline.rebuild(*chunk)
+        self.stdout.write(
+            self.style.SUCCESS(f'Timeline entries written: {total}')
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from posts import counters
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized post, comment and follow counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Amount of rows recomputed in one query.',
+        )
+
+    def reconcile(self, model, function, chunk_size: int) -> int:
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        total = 0
+        for start in range(1, last + 1, chunk_size):
+            total += function(start, start + chunk_size)
+        return total
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        users = self.reconcile(User, counters.reconcile_users, chunk_size)
+        posts = self.reconcile(Post, counters.reconcile_posts, chunk_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Counters reconciled: users {users}, posts {posts}'
+        ))
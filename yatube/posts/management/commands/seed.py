@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import DEFAULT_BATCH_SIZE, seed
+from posts.transfer import bulk_command
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic users, posts and follows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=2,
+                            help='Average amount of comments of a post.')
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Average amount of follows of a user.')
+        parser.add_argument('--heavy-posts', type=int, default=1,
+                            help='Newest posts getting many comments.')
+        parser.add_argument('--heavy-comments', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random generator.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes inserting posts and follows.')
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Do not rebuild counters and timelines.',
+        )
+
+    @bulk_command
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = seed(
+            posts=options['posts'],
+            users=options['users'],
+            groups=options['groups'],
+            follows=options['follows'],
+            comments=options['comments'],
+            heavy_posts=options['heavy_posts'],
+            heavy_comments=options['heavy_comments'],
+            batch_size=options['batch_size'],
+            random_seed=options['seed'],
+            workers=options['workers'],
+            derived=not options['skip_derived'],
+            report=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rows inserted: {sum(counts.values())} '
+            f'in {time.monotonic() - started:.1f} s'
+        ))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts.images import create_derivatives, resolve_thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Register thumbnails of the newest posts and fill the cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=settings.THUMBNAIL_WARM_COUNT,
+            help='Amount of the newest posts to warm up.',
+        )
+
+    def handle(self, *args, **options):
+        posts = list(
+            Post.objects.exclude(image='').filter(
+                processed_image=F('image')
+            ).order_by('-pub_date', '-id')[:options['count']]
+        )
+        for name in {post.image.name for post in posts}:
+            try:
+                create_derivatives(name)
+            except Exception as error:
+                self.stderr.write(f'{name}: {error}')
+        resolve_thumbnails(posts)
+        ready = sum(1 for post in posts if post.thumbnails)
+        self.stdout.write(self.style.SUCCESS(
+            f'Posts with thumbnails ready: {ready} of {len(posts)}'
+        ))
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from posts import search
+
+
+def create_search_index(apps, schema_editor):
+    if not search.is_supported(schema_editor.connection):
+        return
+    for sql in search.CREATE_SQL:
+        schema_editor.execute(sql)
+    search.rebuild(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if not search.is_supported(schema_editor.connection):
+        return
+    for sql in search.DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:18
+
+from django.db import migrations, models
+
+from posts import search
+
+
+def recreate_search_index(apps, schema_editor):
+    """SQLite rebuilds the altered table and loses the index triggers."""
+    if not search.is_supported(schema_editor.connection):
+        return
+    for sql in search.DROP_SQL + search.CREATE_SQL:
+        schema_editor.execute(sql)
+    search.rebuild(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, recreate_search_index
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='processed_image',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Обработанная картинка'),
+        ),
+        migrations.RunPython(
+            recreate_search_index, migrations.RunPython.noop
+        ),
+    ]
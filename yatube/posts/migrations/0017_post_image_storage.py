@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:20
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_processed_image'),
+    ]
+
+    operations = [
+        # Storage does not change the column, SQLite need not rebuild
+        # the table and drop the full-text index triggers.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='post',
+                    name='image',
+                    field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа')], max_length=5, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+                ('start', models.DateTimeField(verbose_name='Начало часа')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество событий')),
+                ('retired', models.PositiveSmallIntegerField(default=0, verbose_name='Из скольких окон вычтен')),
+            ],
+            options={
+                'verbose_name': 'Счётчик активности',
+                'verbose_name_plural': 'Счётчики активности',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('group', 'Группа')], max_length=5, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+                ('score_1h', models.IntegerField(default=0, verbose_name='За час')),
+                ('score_24h', models.IntegerField(default=0, verbose_name='За сутки')),
+                ('score_7d', models.IntegerField(default=0, verbose_name='За неделю')),
+            ],
+            options={
+                'verbose_name': 'Популярность',
+                'verbose_name_plural': 'Популярность',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendscore',
+            index=models.Index(fields=['kind', '-score_1h', 'object_id'], name='trend_score_1h_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendscore',
+            index=models.Index(fields=['kind', '-score_24h', 'object_id'], name='trend_score_24h_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendscore',
+            index=models.Index(fields=['kind', '-score_7d', 'object_id'], name='trend_score_7d_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendscore',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_trend_score'),
+        ),
+        migrations.AddIndex(
+            model_name='trendbucket',
+            index=models.Index(fields=['retired', 'start'], name='trend_bucket_retired_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendbucket',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'start'), name='unique_trend_bucket'),
+        ),
+    ]
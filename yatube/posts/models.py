@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -52,12 +54,38 @@ class Post(models.Model):
         'Картинка',
         upload_to='posts/',
         blank=True,
+        storage=ContentAddressedStorage(),
+    )
+    processed_image = models.CharField(
+        'Обработанная картинка',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
     )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -90,6 +118,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -112,6 +146,12 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -121,3 +161,177 @@ class Follow(models.Model):
 
     def __str__(self):
         return str(self.author)
+
+
+class UserStats(models.Model):
+    """Denormalized counters of a user."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Post in the follow feed of a user, written when the post appears."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post}'
+
+
+class Recommendation(models.Model):
+    """Author suggested to a user, written by ``build_recommendations``."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    score = models.FloatField('Оценка')
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        ordering = ('rank',)
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'rank'],
+                name='unique_recommendation_rank'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TrendBucket(models.Model):
+    """Comments and new posts of a post or a group within an hour."""
+    POST = 'post'
+    GROUP = 'group'
+    KINDS = (
+        (POST, 'Пост'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField('Тип', max_length=5, choices=KINDS)
+    object_id = models.PositiveIntegerField('Идентификатор')
+    start = models.DateTimeField('Начало часа')
+    count = models.PositiveIntegerField('Количество событий', default=0)
+    retired = models.PositiveSmallIntegerField(
+        'Из скольких окон вычтен',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчик активности'
+        verbose_name_plural = 'Счётчики активности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'start'],
+                name='unique_trend_bucket'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['retired', 'start'],
+                name='trend_bucket_retired_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} {self.start}: {self.count}'
+
+
+class TrendScore(models.Model):
+    """Activity of a post or a group within trending windows."""
+    kind = models.CharField(
+        'Тип', max_length=5, choices=TrendBucket.KINDS
+    )
+    object_id = models.PositiveIntegerField('Идентификатор')
+    score_1h = models.IntegerField('За час', default=0)
+    score_24h = models.IntegerField('За сутки', default=0)
+    score_7d = models.IntegerField('За неделю', default=0)
+
+    class Meta:
+        verbose_name = 'Популярность'
+        verbose_name_plural = 'Популярность'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique_trend_score'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['kind', f'-{field}', 'object_id'],
+                name=f'trend_{field}_idx',
+            ) for field in ('score_1h', 'score_24h', 'score_7d')
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
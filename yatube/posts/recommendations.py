@@ -0,0 +1,163 @@
+"""Offline "who to follow" suggestions from the follow graph.
+
+The graph is loaded once into flat sorted arrays, adjacency lists of
+both directions take two integers per follow. For every user authors
+are scored by
+
+* friend of friend: followed by authors the user follows;
+* co-follow: followed by users who follow the same authors, weighted
+  down for popular shared authors.
+
+Followed authors, their follows and fans of popular authors are
+sampled, so the work per user is bounded by ``RECOMMENDATIONS_SAMPLE``
+cubed.
+Top ``RECOMMENDATIONS_TOP`` authors of every user are saved by chunks.
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from core.cache import bump_version
+
+from .models import Follow, Recommendation
+
+RECOMMENDATIONS = 'recommendations'
+
+FRIEND_OF_FRIEND_WEIGHT = 1.0
+CO_FOLLOW_WEIGHT = 0.5
+
+
+class Adjacency:
+    """Adjacency lists of pairs sorted by their first item."""
+
+    def __init__(self, pairs):
+        self.sources = array('q')
+        self.starts = array('q')
+        self.targets = array('q')
+        for source, target in pairs:
+            if not self.sources or self.sources[-1] != source:
+                self.sources.append(source)
+                self.starts.append(len(self.targets))
+            self.targets.append(target)
+        self.starts.append(len(self.targets))
+
+    def __getitem__(self, source: int):
+        position = bisect_left(self.sources, source)
+        if (position == len(self.sources)
+                or self.sources[position] != source):
+            return ()
+        return self.targets[
+            self.starts[position]:self.starts[position + 1]
+        ]
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+
+def sample(items, size: int):
+    """At most ``size`` items spread evenly over a sequence."""
+    return items[::-(-len(items) // size)] if len(items) > size else items
+
+
+def load_graph(chunk_size: int) -> tuple:
+    """``(follows, followers)`` adjacency lists, read through indexes."""
+    edges = Follow.objects.filter(author__isnull=False)
+    follows = Adjacency(edges.order_by('user', 'author').values_list(
+        'user', 'author'
+    ).iterator(chunk_size))
+    followers = Adjacency(edges.order_by('author', 'user').values_list(
+        'author', 'user'
+    ).iterator(chunk_size))
+    return follows, followers
+
+
+def score(user_id: int, follows: Adjacency, followers: Adjacency,
+          size: int) -> dict:
+    """Scores of authors the user does not follow yet."""
+    followed = follows[user_id]
+    scores = defaultdict(float)
+    for author_id in sample(followed, size):
+        for candidate in sample(follows[author_id], size):
+            scores[candidate] += FRIEND_OF_FRIEND_WEIGHT
+        fans = followers[author_id]
+        weight = CO_FOLLOW_WEIGHT / math.log(len(fans) + 1)
+        for fan in sample(fans, size):
+            if fan == user_id:
+                continue
+            for candidate in sample(follows[fan], size):
+                scores[candidate] += weight
+    scores.pop(user_id, None)
+    for author_id in followed:
+        scores.pop(author_id, None)
+    return scores
+
+
+def top(scores: dict, count: int) -> list:
+    """Best ``(author_id, score)``, ties go to older accounts."""
+    return heapq.nlargest(
+        count, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+@transaction.atomic
+def save(start: int, stop, rows: dict) -> None:
+    """Replace suggestions of users with ``start <= id < stop``."""
+    stale = Recommendation.objects.filter(user_id__gte=start)
+    if stop is not None:
+        stale = stale.filter(user_id__lt=stop)
+    stale.delete()
+    Recommendation.objects.bulk_create(
+        Recommendation(
+            user_id=user_id, author_id=author_id, score=value, rank=rank,
+        )
+        for user_id, best in rows.items()
+        for rank, (author_id, value) in enumerate(best)
+    )
+
+
+def build(count: int = None, size: int = None, chunk_size: int = 1000,
+          report=None) -> int:
+    """Recompute suggestions of every user, return amount of users."""
+    count = count or settings.RECOMMENDATIONS_TOP
+    size = size or settings.RECOMMENDATIONS_SAMPLE
+    follows, followers = load_graph(chunk_size)
+    if report:
+        report(f'Loaded {len(follows)} follows')
+    users = follows.sources
+    start = 0
+    for position in range(0, len(users), chunk_size):
+        chunk = users[position:position + chunk_size]
+        rows = {
+            user_id: top(score(user_id, follows, followers, size), count)
+            for user_id in chunk
+        }
+        stop = (
+            users[position + chunk_size]
+            if position + chunk_size < len(users) else None
+        )
+        save(start, stop, rows)
+        start = stop
+        if report:
+            report(f'Users processed: {position + len(chunk)}')
+    if not users:
+        save(0, None, {})
+    bump_version(RECOMMENDATIONS)
+    return len(users)
+
+
+def recommended_authors(user, exclude=None) -> list:
+    """Suggested authors of a user, one indexed query."""
+    if not user.is_authenticated:
+        return []
+    recommendations = user.recommendations.select_related('author')
+    if exclude is not None:
+        recommendations = recommendations.exclude(author=exclude)
+    return [
+        recommendation.author for recommendation
+        in recommendations[:settings.RECOMMENDATIONS_SHOWN]
+    ]
@@ -0,0 +1,111 @@
+import re
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'posts_post_fts'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert "
+    "AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete "
+    "AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update "
+    "AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+)
+DROP_SQL = (
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+)
+REBUILD_SQL = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"
+TRIGGERS = tuple(
+    f'{SEARCH_TABLE}_{event}' for event in ('insert', 'delete', 'update')
+)
+
+
+def is_supported(using=connection) -> bool:
+    """Full-text index exists only in SQLite databases."""
+    return using.vendor == 'sqlite'
+
+
+def rebuild(using=connection) -> None:
+    """Fill the full-text index from the posts table."""
+    with using.cursor() as cursor:
+        cursor.execute(REBUILD_SQL)
+
+
+def missing_triggers(using=connection) -> set:
+    """Index triggers absent from the database, none before the index
+    is created by its migration."""
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE type IN ('table', 'trigger')"
+        )
+        found = set(cursor.fetchall())
+    if ('table', SEARCH_TABLE) not in found:
+        return set()
+    return {name for name in TRIGGERS if ('trigger', name) not in found}
+
+
+def ensure_index(using=connection) -> bool:
+    """Recreate and refill the index if its triggers are lost.
+
+    SQLite rebuilds ``posts_post`` on many schema changes and drops its
+    triggers with it; this runs after every ``migrate``, so a migration
+    need not restore them. Returns whether the index was recreated.
+    """
+    if not is_supported(using) or not missing_triggers(using):
+        return False
+    with using.cursor() as cursor:
+        for sql in DROP_SQL + CREATE_SQL:
+            cursor.execute(sql)
+    rebuild(using)
+    return True
+
+
+def index_migrated(sender, using, **kwargs):
+    """``post_migrate`` receiver of the posts app."""
+    ensure_index(connections[using])
+
+
+def match_expression(query: str) -> str:
+    """Turn user input into an FTS5 query of quoted words."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def search(queryset, query: str):
+    """Posts of ``queryset`` matching ``query``, annotated with ``score``.
+
+    The higher ``score`` is, the more relevant the post is.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none().annotate(score=RawSQL('0.0', ()))
+    if not is_supported():
+        return queryset.filter(text__icontains=query).annotate(
+            score=RawSQL('0.0', ())
+        )
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = posts_post.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    ).annotate(score=RawSQL(f'-{SEARCH_TABLE}.rank', ()))
@@ -0,0 +1,197 @@
+"""Synthetic data for load tests and benchmarks, inserted in bulk.
+
+Popularity follows a power law: an author of rank ``k`` writes posts and
+gets followers with probability about ``1 / k``. Every part of the work
+gets its own random generator derived from the seed, so a dataset does
+not depend on the amount of workers building it.
+"""
+import datetime
+import random
+import time
+from io import StringIO
+from itertools import chain, islice
+from multiprocessing import get_context
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User
+from .transfer import original_dates, reset_sequences
+
+DEFAULT_BATCH_SIZE = 1000
+PART_SIZE = 10000
+DATE_SPREAD = datetime.timedelta(days=365)
+# Large prime spreading popular ranks over the whole id range.
+RANK_STEP = 2_147_483_647
+
+
+def next_id(model) -> int:
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+@transaction.atomic
+def insert(model, objects, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """``bulk_create`` objects of an iterator in a single transaction.
+
+    Only one batch is held in memory at a time.
+    """
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+
+
+def popular(rng, ids: range) -> int:
+    """Id of a range picked by a power law of its rank."""
+    rank = int(len(ids) ** rng.random()) - 1
+    return ids[rank * RANK_STEP % len(ids)]
+
+
+def part_random(plan: dict, phase: str, start: int):
+    return random.Random(f'{plan["random_seed"]}:{phase}:{start}')
+
+
+def insert_posts(plan: dict, start: int, stop: int) -> int:
+    """Posts with ids in ``[start, stop)`` and their comments."""
+    rng = part_random(plan, 'posts', start)
+    users, groups, now = plan['users'], plan['groups'], plan['now']
+    batch_size = plan['batch_size']
+    with original_dates():
+        total = insert(Post, (
+            Post(
+                id=pk,
+                text=f'Сгенерированный пост {pk}',
+                author_id=popular(rng, users),
+                group_id=(
+                    rng.choice(groups)
+                    if groups and rng.random() < 0.7 else None
+                ),
+                pub_date=now - DATE_SPREAD * rng.random(),
+            ) for pk in range(start, stop)
+        ), batch_size)
+        heavy = range(
+            max(start, plan['posts'].stop - plan['heavy_posts']), stop
+        )
+        commented = chain(
+            (rng.randrange(start, stop)
+             for _ in range((stop - start) * plan['comments'])),
+            (post_id for post_id in heavy
+             for _ in range(plan['heavy_comments'])),
+        )
+        total += insert(Comment, (
+            Comment(
+                post_id=post_id,
+                author_id=popular(rng, users),
+                text='Сгенерированный комментарий',
+                created=now - DATE_SPREAD * rng.random(),
+            ) for post_id in commented
+        ), batch_size)
+    return total
+
+
+def insert_follows(plan: dict, start: int, stop: int) -> int:
+    """Follows of users with ids in ``[start, stop)``.
+
+    Amounts of follows have a Pareto distribution averaging ``follows``.
+    """
+    rng = part_random(plan, 'follows', start)
+    users, follows = plan['users'], plan['follows']
+    alpha = 1.5
+    mean = alpha / (alpha - 1)
+
+    def authors(user_id):
+        amount = min(
+            len(users) - 1, int(follows * rng.paretovariate(alpha) / mean)
+        )
+        chosen = {popular(rng, users) for _ in range(amount)}
+        chosen.discard(user_id)
+        return chosen
+
+    return insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in range(start, stop)
+        for author_id in authors(user_id)
+    ), plan['batch_size'])
+
+
+def run_parts(function, plan: dict, ids: range, workers: int) -> int:
+    """Call ``function`` for parts of ``ids``, in processes if asked."""
+    parts = [
+        (plan, start, min(start + PART_SIZE, ids.stop))
+        for start in range(ids.start, ids.stop, PART_SIZE)
+    ]
+    if workers <= 1:
+        return sum(function(*part) for part in parts)
+    # Children must open their own database connections.
+    connections.close_all()
+    with get_context('fork').Pool(workers) as pool:
+        return sum(pool.starmap(function, parts))
+
+
+def seed(posts: int = 1000, users: int = 100, groups: int = 10,
+         follows: int = 10, comments: int = 2, heavy_posts: int = 1,
+         heavy_comments: int = 500, batch_size: int = DEFAULT_BATCH_SIZE,
+         random_seed: int = 0, workers: int = 1, derived: bool = True,
+         report=None) -> dict:
+    """Create a dataset, return amounts of inserted rows by phase.
+
+    Every user follows ``follows`` authors and posts get ``comments``
+    comments on average, the newest ``heavy_posts`` posts get
+    ``heavy_comments`` each. SQLite has a single writer, so it is always
+    filled by one process. Counters and timelines are rebuilt unless
+    ``derived`` is false.
+    """
+    if connection.vendor == 'sqlite':
+        workers = 1
+    first = {model: next_id(model) for model in (User, Group, Post)}
+    plan = {
+        'users': range(first[User], first[User] + users),
+        'groups': range(first[Group], first[Group] + groups),
+        'posts': range(first[Post], first[Post] + posts),
+        'follows': follows,
+        'comments': comments,
+        'heavy_posts': heavy_posts,
+        'heavy_comments': heavy_comments,
+        'batch_size': batch_size,
+        'random_seed': random_seed,
+        'now': timezone.now(),
+    }
+    password = make_password(None)
+    phases = {
+        'users': lambda: insert(User, (
+            User(id=pk, username=f'seed{pk}', password=password)
+            for pk in plan['users']
+        ), batch_size),
+        'groups': lambda: insert(Group, (
+            Group(
+                id=pk, title=f'Группа {pk}', slug=f'seed-{pk}',
+                description='Сгенерированная группа',
+            ) for pk in plan['groups']
+        ), batch_size),
+        'posts and comments': lambda: run_parts(
+            insert_posts, plan, plan['posts'], workers
+        ),
+        'follows': lambda: run_parts(
+            insert_follows, plan, plan['users'], workers
+        ),
+    }
+    counts = {}
+    for phase, function in phases.items():
+        started = time.monotonic()
+        counts[phase] = function()
+        if report:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            report(f'{phase}: {counts[phase]} rows, '
+                   f'{counts[phase] / elapsed:.0f} rows/s')
+    reset_sequences(User, Group, Post)
+    if derived:
+        call_command('reconcile_counters', stdout=StringIO())
+        call_command('rebuild_timelines', stdout=StringIO())
+    return counts
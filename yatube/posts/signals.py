@@ -0,0 +1,135 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_version
+from core.tasks import enqueue
+
+from . import counters, graph, timeline, trending
+from .images import process_post_image
+from .models import (Comment, Follow, Group, Post, Recommendation,
+                     TrendBucket, User, UserStats)
+
+INDEX_PAGE = 'index_page'
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored author of an edited post."""
+    instance._stored_author_id = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not (
+        {'author', 'author_id'} & set(update_fields)
+    ):
+        return
+    instance._stored_author_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('author_id', flat=True).first()
+
+
+def fan_out_post(post_id: int, author_id: int, pub_date) -> None:
+    """Background job: fan a post out, then drop cached follow feeds."""
+    post = Post(id=post_id, author_id=author_id, pub_date=pub_date)
+    if timeline.fan_out(post):
+        bump_version(INDEX_PAGE)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    """Fan a new post out to the followers' timelines."""
+    if created:
+        counters.add_to_user(instance.author_id, 'posts_count', 1)
+        enqueue(
+            fan_out_post, instance.pk, instance.author_id, instance.pub_date
+        )
+        if instance.group_id:
+            trending.record((TrendBucket.GROUP, instance.group_id))
+        return
+    stored = getattr(instance, '_stored_author_id', None)
+    if stored is not None and stored != instance.author_id:
+        counters.add_to_user(stored, 'posts_count', -1)
+        counters.add_to_user(instance.author_id, 'posts_count', 1)
+        timeline.change_author(instance.pk, instance.author_id)
+        bump_version(f'user:{stored}')
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, update_fields=None, **kwargs):
+    """Process a new image right after the upload, not on the first view."""
+    if not instance.image or instance.image.name == instance.processed_image:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    enqueue(process_post_image, instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.add_to_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_post(instance.post_id, 1)
+        activity = [(TrendBucket.POST, instance.post_id)]
+        if instance.post.group_id:
+            activity.append((TrendBucket.GROUP, instance.post.group_id))
+        trending.record(*activity)
+        bump_version(INDEX_PAGE)
+        bump_version(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.add_to_post(instance.post_id, -1)
+    bump_version(INDEX_PAGE)
+    bump_version(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def author_followed(sender, instance, created, **kwargs):
+    if created and instance.author_id:
+        counters.add_to_user(instance.user_id, 'following_count', 1)
+        counters.add_to_user(instance.author_id, 'followers_count', 1)
+        graph.followed(instance.user_id, instance.author_id)
+        Recommendation.objects.filter(
+            user_id=instance.user_id, author_id=instance.author_id
+        ).delete()
+        timeline.backfill(instance.user_id, instance.author_id)
+        bump_version(f'timeline:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def author_unfollowed(sender, instance, **kwargs):
+    if instance.author_id:
+        counters.add_to_user(instance.user_id, 'following_count', -1)
+        counters.add_to_user(instance.author_id, 'followers_count', -1)
+        graph.unfollowed(instance.user_id, instance.author_id)
+        timeline.remove_author(instance.user_id, instance.author_id)
+        bump_version(f'timeline:{instance.user_id}')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_content_changed(sender, instance, **kwargs):
+    """Drop cached pages and cards as soon as anything shown changes."""
+    bump_version(INDEX_PAGE)
+    bump_version(f'{sender._meta.model_name}:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version(INDEX_PAGE)
+    bump_version(f'user:{instance.pk}')
@@ -0,0 +1,49 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from core.cache import get_versions
+
+from ..images import resolve_thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_card.html'
+CARD_KEY = 'post_card:{}:{}'
+
+
+def card_versions(post) -> list:
+    """Namespaces whose changes alter the rendered card of a post."""
+    names = [f'post:{post.pk}', f'user:{post.author_id}']
+    if post.group_id:
+        names.append(f'group:{post.group_id}')
+    return names
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Render post cards, taking unchanged ones from the cache."""
+    posts = list(posts)
+    versions = get_versions(
+        {name for post in posts for name in card_versions(post)}
+    )
+    keys = [
+        CARD_KEY.format(post.pk, '.'.join(
+            str(versions[name]) for name in card_versions(post)
+        )) for post in posts
+    ]
+    cards = cache.get_many(keys)
+    rendered = {}
+    card_template = get_template(CARD_TEMPLATE)
+    stale = [(post, key) for post, key in zip(posts, keys) if key not in cards]
+    resolve_thumbnails(post for post, _ in stale)
+    for post, key in stale:
+        cards[key] = card_template.render({'post': post})
+        # A card showing the original instead of a thumbnail is temporary.
+        if not post.image or post.thumbnails:
+            rendered[key] = cards[key]
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
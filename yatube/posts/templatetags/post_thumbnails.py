@@ -0,0 +1,17 @@
+from django import template
+
+from .. import images
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail_url(post, alias: str) -> str:
+    """Url of a pregenerated thumbnail, no storage or kvstore lookups."""
+    return images.thumbnail_url(post, alias)
+
+
+@register.filter
+def thumbnail_sources(post, alias: str) -> list:
+    """Variants of a thumbnail in modern formats for ``<picture>``."""
+    return images.thumbnail_sources(post, alias)
@@ -0,0 +1,17 @@
+from django import template
+from django.conf import settings
+
+from .. import trending
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/trending.html')
+def trending_sidebar():
+    """Most active posts and groups of the default window."""
+    top = trending.trending()
+    size = settings.TRENDING_SIDEBAR_SIZE
+    return {
+        'posts': top['posts'][:size],
+        'groups': top['groups'][:size],
+    }
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_budget import assert_query_budget
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(settings.POST_PER_PAGE + 5):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=cls.author,
+                group=cls.group,
+            )
+        cls.post = Post.objects.latest('pub_date', 'id')
+        Comment.objects.create(
+            text='Комментарий', post=cls.post, author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def feed_urls(self) -> list:
+        return [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:api_profile', kwargs={'username': 'writer'}),
+            reverse('posts:api_follow_index'),
+        ]
+
+    def test_feeds_are_paginated(self):
+        """Feeds return a page of posts and a link to the next one."""
+        for url in self.feed_urls():
+            with self.subTest(url=url):
+                with assert_query_budget(url):
+                    data = self.client.get(url).json()
+                self.assertEqual(
+                    len(data['results']), settings.POST_PER_PAGE
+                )
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': 'writer',
+                    'group': 'test-slug',
+                    'image': None,
+                    'thumbnail': None,
+                    'comments_count': 1,
+                })
+                self.assertIsNone(data['previous'])
+                rest = self.client.get(data['next']).json()
+                self.assertEqual(len(rest['results']), 5)
+                self.assertIsNone(rest['next'])
+
+    def test_post_detail(self):
+        """Post detail returns the post with its comments."""
+        url = reverse('posts:api_post_detail', kwargs={'post_id': 1000})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        url = reverse(
+            'posts:api_post_detail', kwargs={'post_id': self.post.pk}
+        )
+        with assert_query_budget(url):
+            data = self.client.get(url).json()
+        self.assertEqual(data['post']['id'], self.post.pk)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий'],
+        )
+        self.assertIsNone(data['next'])
+
+    def test_unchanged_feed_is_not_modified(self):
+        """Unchanged feeds answer 304, changes give a new ETag."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_feed_changes_on_unfollow(self):
+        """Follow feed ETag changes when the user unfollows an author."""
+        url = reverse('posts:api_follow_index')
+        etag = self.client.get(url)['ETag']
+        Follow.objects.filter(user=self.user).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_follow_feed_needs_login(self):
+        """Anonymous users get a JSON error instead of a redirect."""
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
@@ -0,0 +1,145 @@
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from .. import benchmark, urls
+from ..models import Comment, Follow, Group, Post, User, UserStats
+from ..transfer import original_dates
+
+
+class BenchmarkTest(TestCase):
+    def test_seed(self):
+        """Seeded dataset has the requested shape and counters."""
+        call_command(
+            'seed', posts=50, users=10, follows=3, comments=2,
+            heavy_comments=20, stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Comment.objects.count(), 50 * 2 + 20)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        heavy = Post.objects.order_by('-comments_count').first()
+        self.assertGreaterEqual(heavy.comments_count, 20)
+
+    def follow_graph(self):
+        """Follows by positions of users, whatever their ids are."""
+        first = User.objects.order_by('pk').first().pk
+        return [
+            (user - first, author - first) for user, author
+            in Follow.objects.order_by('user', 'author').values_list(
+                'user', 'author'
+            )
+        ]
+
+    def test_seed_command(self):
+        """Same seed gives the same dataset, popular authors stand out."""
+        options = {
+            'users': 200, 'posts': 300, 'follows': 10, 'groups': 3,
+            'heavy_posts': 0, 'seed': 7, 'stdout': StringIO(),
+        }
+        call_command('seed', **options)
+        graph = self.follow_graph()
+        User.objects.all().delete()
+        call_command('seed', **options)
+        self.assertEqual(self.follow_graph(), graph)
+        self.assertEqual(Post.objects.count(), 300)
+        top = UserStats.objects.order_by('-followers_count').first()
+        self.assertGreater(top.followers_count, len(graph) / 20)
+
+    def test_benchmark_views(self):
+        """Every view of posts.urls is measured and saved as JSON."""
+        call_command(
+            'seed', posts=30, users=5, follows=2, heavy_comments=5,
+            stdout=StringIO(),
+        )
+        follows = self.follow_graph()
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_views', existing=True, repeat=2,
+                output=output.name, stdout=StringIO(),
+            )
+            report = json.load(output)
+        self.assertEqual(
+            list(report['results']),
+            [
+                pattern.name for pattern in urls.urlpatterns
+                if pattern.name not in benchmark.MUTATING_VIEWS
+            ],
+        )
+        self.assertEqual(self.follow_graph(), follows)
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertIn('queries', result)
+                self.assertIn('bytes', result)
+
+    def test_mutating_views_are_rolled_back(self):
+        """Follow and unfollow views are measured without changes."""
+        call_command('seed', posts=10, users=5, follows=2, stdout=StringIO())
+        follows = self.follow_graph()
+        results = benchmark.run(repeat=2)
+        self.assertLessEqual(set(benchmark.MUTATING_VIEWS), set(results))
+        self.assertEqual(self.follow_graph(), follows)
+
+
+class TransferTest(TestCase):
+    def test_export_and_import(self):
+        """Imported data keeps dates and gets counters and timelines."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=post.pub_date - timedelta(days=30)
+        )
+        Comment.objects.create(text='Комментарий', post=post, author=reader)
+        Follow.objects.create(user=reader, author=author)
+        exported = StringIO()
+        call_command('export_posts', stdout=exported, stderr=StringIO())
+        old_date = Post.objects.get(pk=post.pk).pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.write(exported.getvalue())
+            file.flush()
+            call_command(
+                'import_posts', file.name, chunk_size=1, stdout=StringIO()
+            )
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.pub_date, old_date)
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertEqual(
+            list(reader.timeline.values_list('post_id', flat=True)),
+            [post.pk],
+        )
+
+    def test_import_refuses_database_with_posts(self):
+        """Import stops before inserting anything if posts exist."""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.write('{"type": "group", "slug": "new", "title": "Новая", '
+                       '"description": "Описание"}\n')
+            file.flush()
+            with self.assertRaises(CommandError):
+                call_command('import_posts', file.name, stdout=StringIO())
+        self.assertFalse(Group.objects.filter(slug='new').exists())
+
+    def test_original_dates_only_in_commands(self):
+        """Auto dates are switched off only by a bulk command."""
+        with self.assertRaises(RuntimeError):
+            with original_dates():
+                pass
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
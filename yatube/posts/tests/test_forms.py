@@ -75,18 +75,15 @@ class PostFormTest(TestCase):
             )
         )
         self.assertEqual(Post.objects.count(), post_count + 1)
-        self.assertEqual(
-            Post.objects.get(
-                text='Тестовый пост'
-            ).image,
-            'posts/small.gif'
-        )
+        image = Post.objects.get(text='Тестовый пост').image
+        self.assertTrue(image.storage.is_hashed(image.name))
+        self.assertTrue(image.name.endswith('.gif'))
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый пост',
                 author=self.user.id,
                 group=self.group.id,
-                image='posts/small.gif'
+                image=image.name
             ).exists()
         )
 
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -93,3 +96,80 @@ class PostModelTest(TestCase):
                     post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Counters change on creation and deletion of objects."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        comment = Comment.objects.create(
+            text='Комментарий',
+            post=post,
+            author=self.reader,
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_counters_follow_author_change(self):
+        """Moving a post to another author moves its count too."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        post.author = self.reader
+        post.save()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.reader).posts_count, 1)
+
+    def test_drifted_counters_stay_positive(self):
+        """Deletion never takes a stale counter below zero."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        Comment.objects.create(
+            text='Комментарий', post=post, author=self.reader
+        )
+        UserStats.objects.filter(user=self.author).update(posts_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_reconcile_counters_command(self):
+        """Command recomputes counters skipped by bulk operations."""
+        posts = Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=self.author)
+            for number in range(3)
+        )
+        post = Post.objects.filter(author=self.author).first()
+        Comment.objects.bulk_create(
+            Comment(text='Комментарий', post=post, author=self.reader)
+            for _ in range(2)
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)]
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command(
+            'reconcile_counters', chunk_size=1, stdout=StringIO()
+        )
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, len(posts))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(post.comments_count, 2)
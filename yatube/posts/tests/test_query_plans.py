@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from .utils import QueryPlanMixin
+
+User = get_user_model()
+
+
+class FeedQueryPlansTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Planner')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(12):
+            Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=cls.author,
+                group=cls.group,
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            text='Комментарий',
+            post=cls.post,
+            author=cls.user,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_feed_queries_use_indexes(self):
+        """Feed pages neither scan whole tables nor sort in temp B-trees."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cursor = self.client.get(url).context['page_obj'].next_cursor
+                cache.clear()
+                with self.assertQueriesUseIndexes():
+                    self.client.get(url)
+                    self.client.get(f'{url}?cursor={cursor}')
+
+    def test_post_detail_queries_use_indexes(self):
+        """Post page queries are served by indexes."""
+        with self.assertQueriesUseIndexes():
+            self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+            )
+
+    def test_trending_queries_use_indexes(self):
+        """Trending rankings are read from score indexes."""
+        for window in ('1h', '24h', '7d'):
+            with self.subTest(window=window):
+                cache.clear()
+                with self.assertQueriesUseIndexes():
+                    self.client.get(
+                        reverse('posts:trending'), {'window': window}
+                    )
@@ -1,16 +1,37 @@
+import os
 import shutil
 import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail.models import KVStore
 
-from ..models import Comment, Follow, Group, Post
+from core.cache import get_version
+from core.query_budget import assert_query_budget
 
+from ..images import IMAGE_STORAGE, resolve_thumbnails, variant_name
+from .. import recommendations, search, trending
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      TrendBucket, TrendScore, UserStats)
+from ..signals import INDEX_PAGE
+from ..thumbnails import backend
+
+ORIENTATION = 0x0112
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
@@ -45,6 +66,7 @@ class PostPagesTest(TestCase):
             group=cls.group,
             image=uploaded
         )
+        cls.post.refresh_from_db()
 
     @classmethod
     def tearDownClass(cls):
@@ -94,7 +116,7 @@ class PostPagesTest(TestCase):
         )
         post = response.context['post']
         self.assertEqual(post.text, self.post.text)
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(post.image, self.post.image.name)
 
     def test_index_page_show_correct_context(self):
         """Context test for index page."""
@@ -103,7 +125,7 @@ class PostPagesTest(TestCase):
         post = response.context['page_obj'][0]
         self.assertEqual(post.text, self.post.text)
         self.assertEqual(post.id, self.post.id)
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(post.image, self.post.image.name)
 
     def test_group_list_page_show_correct_context(self):
         """Context test for group list page."""
@@ -117,7 +139,7 @@ class PostPagesTest(TestCase):
         self.assertEqual(post.text, self.post.text)
         self.assertEqual(post.id, self.post.id)
         self.assertEqual(post.group.id, self.group.id)
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(post.image, self.post.image.name)
 
     def test_profile_page_show_correct_context(self):
         """Context test for profile page."""
@@ -135,7 +157,7 @@ class PostPagesTest(TestCase):
         self.assertEqual(profile.group.id, self.group.id)
         self.assertEqual(posts_quantity, 1)
         self.assertEqual(author.id, self.user.id)
-        self.assertEqual(profile.image, 'posts/small.gif')
+        self.assertEqual(profile.image, self.post.image.name)
 
     def test_post_create_page_show_correct_context(self):
         """Context test for post creation page."""
@@ -196,7 +218,11 @@ class PaginatorViewsTest(TestCase):
     def test_second_index_page_contains_one_record(self):
         """Index page paginator. Second page"""
         cache.clear()
-        response = self.client.get(reverse('posts:index') + '?page=2')
+        response = self.client.get(reverse('posts:index'))
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={cursor}'
+        )
         self.assertEqual(len(response.context['page_obj']), 1)
 
     def test_first_group_list_page_contains_ten_records(self):
@@ -211,12 +237,12 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_group_list_page_contains_one_record(self):
         """Group page paginator. Second page."""
-        response = self.client.get(
-            reverse(
-                'posts:group_posts',
-                kwargs={'slug': self.group.slug}
-            ) + '?page=2'
+        url = reverse(
+            'posts:group_posts',
+            kwargs={'slug': self.group.slug}
         )
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        response = self.client.get(url + f'?cursor={cursor}')
         self.assertEqual(len(response.context['page_obj']), 1)
 
     def test_first_profile_page_contains_ten_records(self):
@@ -231,14 +257,183 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_profile_page_contains_one_record(self):
         """Author page paginator. Second page."""
-        response = self.client.get(
-            reverse(
-                'posts:profile',
-                kwargs={'username': self.user.username}
-            ) + '?page=2'
+        url = reverse(
+            'posts:profile',
+            kwargs={'username': self.user.username}
         )
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        response = self.client.get(url + f'?cursor={cursor}')
         self.assertEqual(len(response.context['page_obj']), 1)
 
+    def test_cursor_pages_are_consistent(self):
+        """Cursor pages go back and forth without gaps."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        first = self.client.get(url).context['page_obj']
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.client.get(
+            url + f'?cursor={first.next_cursor}'
+        ).context['page_obj']
+        self.assertTrue(second.has_previous())
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            url + f'?cursor={second.previous_cursor}'
+        ).context['page_obj']
+        last = self.client.get(
+            url + f'?cursor={first.last_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertEqual(list(first) + list(second), list(
+            Post.objects.order_by('-pub_date', '-id')
+        ))
+        self.assertEqual(list(last), list(second))
+        self.assertTrue(last.has_previous())
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Broken cursor falls back to the first page."""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username})
+            + '?cursor=broken'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Windowed')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {number}', author=cls.user)
+            for number in range(55)
+        )
+        cls.url = reverse('posts:profile', kwargs={'username': cls.user})
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, cursor=None):
+        url = f'{self.url}?cursor={cursor}' if cursor else self.url
+        return self.client.get(url).context['page_obj']
+
+    def numbers(self, page):
+        return [number for number, _ in page.window]
+
+    def test_window_around_current_page(self):
+        """Only pages close to the current one are linked."""
+        first = self.get_page()
+        self.assertEqual(self.numbers(first), [1, 2, 3])
+        third = self.get_page(dict(first.window)[3])
+        self.assertEqual(third.number, 3)
+        self.assertEqual(self.numbers(third), [1, 2, 3, 4, 5])
+        self.assertEqual(third[0].text, 'Тестовый пост 34')
+        back = self.get_page(dict(third.window)[1])
+        self.assertEqual(list(back), list(first))
+
+    def test_last_page_number_is_estimated(self):
+        """Last page gets its number from the estimated count."""
+        last = self.get_page(self.get_page().last_cursor)
+        self.assertEqual(last.number, 6)
+        self.assertEqual(len(last), 5)
+        self.assertEqual(last[0].text, 'Тестовый пост 4')
+        self.assertEqual(last[-1].text, 'Тестовый пост 0')
+        self.assertEqual(self.numbers(last), [4, 5, 6])
+        fifth = self.get_page(last.previous_cursor)
+        self.assertEqual(fifth.number, 5)
+        self.assertEqual(fifth[0].text, 'Тестовый пост 14')
+        self.assertEqual(fifth[-1].text, 'Тестовый пост 5')
+        self.assertEqual(self.numbers(fifth), [3, 4, 5, 6])
+        fourth = self.get_page(dict(last.window)[4])
+        self.assertEqual(fourth.number, 4)
+        self.assertEqual(fourth[0].text, 'Тестовый пост 24')
+
+    def test_estimated_count_is_cached(self):
+        """Count is made once per queryset, not for every page."""
+        response = self.client.get(self.url)
+        self.assertContains(response, '(≈6)')
+        self.assertContains(response, 'class="page-item', count=5)
+        Post.objects.create(text='Ещё пост', author=self.user)
+        # The author with counters and the page, no count.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, '(≈6)')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def urls(self) -> list:
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Pages answer 304 without rendering until their content changes."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                with self.assertTemplateNotUsed('base.html'):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.user
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_depend_on_user(self):
+        """Validators differ between users and change on follows."""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(Client().get(url)['ETag'], etag)
+        Follow.objects.create(user=self.author, author=self.user)
+        other_url = reverse('posts:profile', kwargs={'username': self.user})
+        other_etag = self.client.get(other_url)['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        for page, page_etag in ((url, etag), (other_url, other_etag)):
+            with self.subTest(url=page):
+                response = self.client.get(page, HTTP_IF_NONE_MATCH=page_etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_depend_on_session_and_csrf_token(self):
+        """A new login or CSRF token gives pages with forms a new ETag."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.client.logout()
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
 
 class PostCreateTest(TestCase):
     @classmethod
@@ -257,6 +452,7 @@ class PostCreateTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -349,6 +545,43 @@ class CommentCreationTest(TestCase):
             )
         )
 
+    def test_comments_are_paginated(self):
+        """Post page shows a page of comments, the rest loads on demand."""
+        for number in range(settings.COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                text=f'Комментарий {number}',
+                post=self.post,
+                author=self.user,
+            )
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        first = response.context['comments']
+        self.assertEqual(len(first), settings.COMMENTS_PER_PAGE)
+        self.assertTrue(first.has_next())
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        self.assertContains(
+            response, f'href="{detail_url}?cursor={first.next_cursor}"'
+        )
+        self.assertContains(
+            response,
+            f'data-comments-more="{url}?cursor={first.next_cursor}"',
+        )
+        with assert_query_budget(url):
+            response = self.client.get(url, {'cursor': first.next_cursor})
+        rest = response.context['comments']
+        self.assertFalse(rest.has_next())
+        self.assertNotContains(response, 'data-comments-more')
+        page = self.client.get(detail_url, {'cursor': first.next_cursor})
+        self.assertEqual(list(page.context['comments']), list(rest))
+        self.assertCountEqual(
+            [comment.pk for comment in list(first) + list(rest)],
+            self.post.comments.values_list('pk', flat=True),
+        )
+
 
 class IndexPageCacheTest(TestCase):
     @classmethod
@@ -365,17 +598,42 @@ class IndexPageCacheTest(TestCase):
         self.client.force_login(self.user)
 
     def test_index_page_cache(self):
-        """Index page cache test."""
+        """Index page cache is dropped when a post is deleted."""
         cache.clear()
-        self.client.get(reverse('posts:index'))
-        post_to_eliminate = Post.objects.get(id=self.post.id)
-        post_to_eliminate.delete()
         response = self.client.get(reverse('posts:index'))
         self.assertTrue(bytes(self.post.text, 'utf-8') in response.content)
-        cache.clear()
+        post_to_eliminate = Post.objects.get(id=self.post.id)
+        post_to_eliminate.delete()
         response2 = self.client.get(reverse('posts:index'))
         self.assertFalse(bytes(self.post.text, 'utf-8') in response2.content)
 
+    def test_new_post_appears_at_once(self):
+        """New post is shown on a cached index page immediately."""
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertTrue(bytes('Свежий пост', 'utf-8') in response.content)
+
+    def test_cache_hit_makes_no_queries(self):
+        """Cached index page is served without SQL queries."""
+        cache.clear()
+        anonymous = Client()
+        first = anonymous.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            second = anonymous.get(reverse('posts:index'))
+        self.assertEqual(first.content, second.content)
+
+    def test_last_login_keeps_cache(self):
+        """Logging in does not invalidate the index page."""
+        self.user.set_password('password')
+        self.user.save()
+        cache.clear()
+        Client().get(reverse('posts:index'))
+        Client().login(username=self.user.username, password='password')
+        with self.assertNumQueries(0):
+            Client().get(reverse('posts:index'))
+
 
 class SubscriptionTest(TestCase):
     @classmethod
@@ -431,6 +689,49 @@ class SubscriptionTest(TestCase):
         )
         self.assertFalse(subscription.exists())
 
+    def test_pages_of_user_without_stats(self):
+        """Users inserted in bulk get zero counters until reconciled."""
+        User.objects.bulk_create([User(username='bulk')])
+        author = User.objects.get(username='bulk')
+        self.assertFalse(UserStats.objects.filter(user=author))
+        Post.objects.bulk_create([Post(text='Пост', author=author)])
+        post = Post.objects.get(author=author)
+        for url in (
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ):
+            with self.subTest(url=url):
+                response = self.client_vasya.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['posts_quantity'], 0)
+
+    def test_profile_follow_state_is_cached(self):
+        """Profile takes follow counters and state from the cache,
+        following shifts counters in place and reloads the follows
+        with one query."""
+        cache.clear()
+        url = reverse('posts:profile', args=[self.user_petya.username])
+        response = self.client_vasya.get(url)
+        self.assertFalse(response.context['following'])
+        self.assertEqual(response.context['followers_quantity'], 1)
+        self.client_vasya.get(
+            reverse('posts:profile_follow', args=[self.user_petya.username])
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client_vasya.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['followers_quantity'], 2)
+        self.assertEqual(len([
+            query for query in context.captured_queries
+            if 'posts_follow' in query['sql']
+        ]), 1)
+        self.client_vasya.get(
+            reverse('posts:profile_unfollow', args=[self.user_petya.username])
+        )
+        response = self.client_vasya.get(url)
+        self.assertFalse(response.context['following'])
+        self.assertEqual(response.context['followers_quantity'], 1)
+
     def test_new_post_for_followers(self):
         """Post appears in followers set."""
         self.client_petya.post(
@@ -449,3 +750,649 @@ class SubscriptionTest(TestCase):
         self.assertFalse(
             bytes('Тестовый пост', 'utf-8') in response_vasya.content
         )
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_page(self):
+        return self.client.get(reverse('posts:follow_index'))
+
+    def test_follow_backfills_timeline(self):
+        """Posts written before the subscription appear in the feed."""
+        self.client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertEqual(
+            list(self.follow_page().context['page_obj']), [self.old_post]
+        )
+
+    def test_new_post_fans_out_and_unfollow_prunes(self):
+        """New post gets to the feed, unsubscription removes it."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            list(self.follow_page().context['page_obj']),
+            [new_post, self.old_post]
+        )
+        self.client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username}
+            )
+        )
+        self.assertEqual(len(self.follow_page().context['page_obj']), 0)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    @override_settings(TIMELINE_SIZE=3)
+    def test_timeline_size_is_capped(self):
+        """Timeline keeps only TIMELINE_SIZE newest posts."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=self.author)
+            for number in range(5)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        newest = [
+            Post.objects.create(text=f'Новый {number}', author=self.author)
+            for number in range(2)
+        ]
+        entries = TimelineEntry.objects.filter(
+            user=self.reader
+        ).order_by('-pub_date', '-post_id')
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(
+            [entry.post for entry in entries[:2]], newest[::-1]
+        )
+
+    @override_settings(TIMELINE_SIZE=3)
+    def test_unfollow_refills_timeline(self):
+        """Posts pruned for an unfollowed author come back."""
+        other = User.objects.create_user(username='other_author')
+        for author in (self.author, other):
+            Follow.objects.create(user=self.reader, author=author)
+        kept = [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(3)
+        ]
+        for number in range(3):
+            Post.objects.create(text=f'Другой {number}', author=other)
+        Follow.objects.get(user=self.reader, author=other).delete()
+        self.assertEqual(
+            list(self.follow_page().context['page_obj']), kept[::-1]
+        )
+
+    def test_timeline_pages(self):
+        """Follow feed is paginated by cursor."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=self.author)
+            for number in range(10)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        first = self.follow_page().context['page_obj']
+        second = self.client.get(
+            reverse('posts:follow_index') + f'?cursor={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertEqual(list(second), [self.old_post])
+
+    def test_rebuild_timelines_command(self):
+        """Command restores a lost timeline."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(self.follow_page().context['page_obj']), [self.old_post]
+        )
+
+    @override_settings(TIMELINE_SIZE=3)
+    def test_rebuild_keeps_newest_posts(self):
+        """Rebuilt timelines hold only TIMELINE_SIZE newest posts."""
+        other = User.objects.create_user(username='other_reader')
+        newest = [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(4)
+        ][:-4:-1]
+        for user in (self.reader, other):
+            Follow.objects.create(user=user, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', chunk_size=1, stdout=StringIO())
+        for user in (self.reader, other):
+            with self.subTest(user=user):
+                self.assertEqual([
+                    entry.post for entry in TimelineEntry.objects.filter(
+                        user=user
+                    ).order_by('-pub_date', '-post_id')
+                ], newest)
+
+
+class RecommendationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'friend_author', 'fan', 'other')
+        }
+        for user, author in (
+            ('reader', 'friend'),
+            ('friend', 'friend_author'),
+            ('fan', 'friend'),
+            ('fan', 'other'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users['reader'])
+
+    def suggested(self, user='reader'):
+        return list(self.users[user].recommendations.values_list(
+            'author__username', flat=True
+        ))
+
+    def test_build_recommendations(self):
+        """Friends of friends go first, then authors of similar users."""
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual(self.suggested(), ['friend_author', 'other'])
+        self.assertEqual(self.suggested('friend'), [])
+        self.assertEqual(self.suggested('fan'), ['friend_author'])
+
+    def test_scoring_is_sampled(self):
+        """Work per user is bounded whatever the user follows."""
+        pairs = [(1, author) for author in range(100, 150)]
+        pairs += [
+            (author, candidate)
+            for author in range(100, 150)
+            for candidate in range(1000, 1050)
+        ]
+        follows = recommendations.Adjacency(sorted(pairs))
+        followers = recommendations.Adjacency(
+            sorted((target, source) for source, target in pairs)
+        )
+        scores = recommendations.score(1, follows, followers, 5)
+        self.assertLessEqual(sum(scores.values()), 5 * 5)
+        self.assertTrue(scores)
+
+    def test_recommendations_are_shown(self):
+        """Suggestions are on the follow feed and profiles, a followed
+        author is not suggested any more."""
+        call_command('build_recommendations', stdout=StringIO())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['recommendations'],
+            [self.users['friend_author'], self.users['other']],
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=['other'])
+        )
+        self.assertEqual(
+            response.context['recommendations'],
+            [self.users['friend_author']],
+        )
+        self.client.get(reverse('posts:profile_follow', args=['other']))
+        self.assertEqual(self.suggested(), ['friend_author'])
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Trend')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.user)
+        cls.busy = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user, group=cls.group
+        )
+        for post, amount in ((cls.quiet, 1), (cls.busy, 3)):
+            for _ in range(amount):
+                Comment.objects.create(
+                    text='Комментарий', post=post, author=cls.user
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_trending_page(self):
+        """Posts and groups are ranked by comments and new posts."""
+        url = reverse('posts:trending')
+        with assert_query_budget(url):
+            response = self.client.get(url, {'window': '1h'})
+        top = response.context['trending']
+        self.assertEqual(top['posts'], [self.busy, self.quiet])
+        self.assertEqual(top['posts'][0].trend_score, 3)
+        self.assertEqual(top['groups'], [self.group])
+        self.assertEqual(top['groups'][0].trend_score, 1 + 3)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:trending'))
+
+    def test_compaction(self):
+        """Old activity leaves short windows, then is deleted."""
+        now = timezone.now()
+        post = (TrendBucket.POST, self.quiet.pk)
+        trending.record(post, moment=now - timedelta(hours=3))
+        trending.record(post, moment=now - timedelta(days=8))
+        version = get_version(INDEX_PAGE)
+        call_command('compact_trending', stdout=StringIO())
+        self.assertNotEqual(get_version(INDEX_PAGE), version)
+        score = TrendScore.objects.get(
+            kind=TrendBucket.POST, object_id=self.quiet.pk
+        )
+        self.assertEqual(
+            (score.score_1h, score.score_24h, score.score_7d), (1, 2, 2)
+        )
+        self.assertFalse(TrendBucket.objects.filter(
+            start__lt=now - timedelta(days=7)
+        ))
+        version = get_version(INDEX_PAGE)
+        call_command('compact_trending', stdout=StringIO())
+        self.assertEqual(get_version(INDEX_PAGE), version)
+        score.refresh_from_db()
+        self.assertEqual(score.score_7d, 2)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Cached')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_card_is_shared_between_feeds(self):
+        """Card rendered for one feed is reused by another."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, 'includes/post_card.html')
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        )
+        self.assertTemplateNotUsed(response, 'includes/post_card.html')
+        self.assertContains(response, self.post.text)
+
+    def test_card_follows_changes(self):
+        """Edited post, author and group invalidate the card."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertContains(self.client.get(url), 'Исправленный пост')
+        post.author.first_name = 'Василий'
+        post.author.save()
+        self.assertContains(self.client.get(url), 'Василий')
+        post.group.slug = 'new-slug'
+        post.group.save()
+        self.assertContains(self.client.get(url), '/group/new-slug/')
+
+
+# Budgets are set for a deployment with a shared cache, which keeps
+# sessions and users out of the database.
+@override_settings(
+    SHARED_CACHE=True,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Counter')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add_content(self, amount: int):
+        for number in range(amount):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=self.author,
+                group=self.group,
+            )
+            Comment.objects.create(
+                text=f'Комментарий {number}',
+                post=self.post,
+                author=self.user if number % 2 else self.author,
+            )
+
+    def count_queries(self, urls) -> list:
+        counts = []
+        for url in urls:
+            cache.clear()
+            with assert_query_budget(url) as context:
+                self.client.get(url)
+            counts.append(len(context))
+        return counts
+
+    def test_budget_does_not_depend_on_content(self):
+        """Feed and post pages keep their query budgets on any volume."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+        )
+        self.add_content(11)
+        small = self.count_queries(urls)
+        self.add_content(30)
+        self.assertEqual(self.count_queries(urls), small)
+
+    def test_write_views_budget(self):
+        """Write views keep their query budgets."""
+        comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk}
+        )
+        with assert_query_budget(comment_url):
+            self.client.post(comment_url, {'text': 'Комментарий'})
+        create_url = reverse('posts:post_create')
+        with assert_query_budget(create_url):
+            self.client.post(
+                create_url, {'text': 'Новый пост', 'group': self.group.pk}
+            )
+        unfollow_url = reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        )
+        with assert_query_budget(unfollow_url):
+            self.client.get(unfollow_url)
+        follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        )
+        with assert_query_budget(follow_url):
+            self.client.get(follow_url)
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Seeker')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.rare = Post.objects.create(
+            text='Кот спит на окне',
+            author=cls.user,
+        )
+        cls.often = Post.objects.create(
+            text='Кот, кот и ещё раз кот',
+            author=cls.other,
+            group=cls.group,
+        )
+        Post.objects.create(text='Собака лает', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:post_search'), params)
+        self.assertEqual(response.status_code, 200)
+        page_obj = response.context['page_obj']
+        return [] if page_obj is None else list(page_obj)
+
+    def test_results_are_ranked(self):
+        """More relevant posts go first."""
+        self.assertEqual(self.found(q='кот'), [self.often, self.rare])
+
+    def test_filters(self):
+        """Results are limited by group and author."""
+        self.assertEqual(
+            self.found(q='кот', group=self.group.slug), [self.often]
+        )
+        self.assertEqual(
+            self.found(q='кот', author=self.user.username), [self.rare]
+        )
+
+    def test_index_follows_changes(self):
+        """Edited and deleted posts are found by their current text."""
+        post = Post.objects.get(pk=self.rare.pk)
+        post.text = 'Попугай спит на окне'
+        post.save()
+        self.assertEqual(self.found(q='попугай'), [post])
+        self.assertEqual(self.found(q='кот'), [self.often])
+        post.delete()
+        self.assertEqual(self.found(q='попугай'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Operators and quotes in a query do not break the search."""
+        for query in ('"кот', 'кот AND (', '*', 'NEAR(кот'):
+            with self.subTest(query=query):
+                self.found(q=query)
+
+    def test_results_are_paginated(self):
+        """Search results are paginated by cursor, keeping the query."""
+        Post.objects.bulk_create(
+            Post(text=f'Лис номер {number}', author=self.user)
+            for number in range(15)
+        )
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': 'лис'}
+        )
+        first = response.context['page_obj']
+        self.assertContains(response, '?q=%D0%BB%D0%B8%D1%81&cursor=')
+        second = self.client.get(
+            reverse('posts:post_search'),
+            {'q': 'лис', 'cursor': first.next_cursor},
+        ).context['page_obj']
+        self.assertEqual(len(first) + len(second), 15)
+        self.assertFalse(set(first) & set(second))
+
+    def test_lost_triggers_come_back_after_migrate(self):
+        """Triggers dropped by a table rebuild are restored by migrate."""
+        self.assertEqual(search.missing_triggers(), set())
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {search.TRIGGERS[0]}')
+        self.assertEqual(search.missing_triggers(), {search.TRIGGERS[0]})
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(search.missing_triggers(), set())
+        post = Post.objects.create(text='Ёж бежит', author=self.user)
+        self.assertEqual(self.found(q='ёж'), [post])
+
+    def test_rebuild_search_index_command(self):
+        """Command restores the index from the posts table."""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found(q='собака')[0].text, 'Собака лает')
+
+    def test_admin_uses_index(self):
+        """Admin search finds posts through the full-text index."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin',
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, image_format='PNG', color='blue',
+                    **options) -> Post:
+        image = Image.new('RGB', (40, 20), color)
+        content = BytesIO()
+        image.save(content, format=image_format, **options)
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                f'picture.{image_format.lower()}', content.getvalue(),
+                content_type=f'image/{image_format.lower()}',
+            ),
+        })
+        return Post.objects.filter(author=self.user).order_by('pk').last()
+
+    def test_thumbnails_created_on_upload(self):
+        """Thumbnails exist right after the upload."""
+        post = self.create_post()
+        thumbnail = backend.thumbnail(post.image, 'card')
+        self.assertTrue(thumbnail.exists())
+
+    def test_feed_does_not_touch_thumbnail_store(self):
+        """Feed with images reads no thumbnail records."""
+        post = self.create_post()
+        url = reverse('posts:index')
+        with assert_query_budget(url):
+            response = self.client.get(url)
+        self.assertContains(
+            response, backend.thumbnail(post.image, 'card').url
+        )
+
+    def test_generate_thumbnails_command(self):
+        """Command recreates missing thumbnails of existing posts."""
+        post = self.create_post()
+        thumbnail = backend.thumbnail(post.image, 'card')
+        thumbnail.delete()
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertTrue(thumbnail.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIZE=(10, 10))
+    def test_original_is_processed(self):
+        """Original loses EXIF, turns upright and fits the size limit."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        post = self.create_post('JPEG', exif=exif.tobytes())
+        self.assertEqual(post.processed_image, post.image.name)
+        with post.image.open() as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (5, 10))
+            self.assertNotIn(ORIENTATION, image.getexif())
+
+    @override_settings(POST_IMAGE_VARIANTS=('png',))
+    def test_variants_created(self):
+        """Original and thumbnails get variants shown in the feed."""
+        post = self.create_post('JPEG')
+        thumbnail = backend.thumbnail(post.image, 'card')
+        for name in (post.image.name, thumbnail.name):
+            with self.subTest(name=name):
+                self.assertTrue(
+                    default_storage.exists(variant_name(name, 'png'))
+                )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, default_storage.url(variant_name(thumbnail.name, 'png'))
+        )
+
+    def test_equal_uploads_share_file(self):
+        """Equal uploads are stored once under the hash of the content."""
+        first = self.create_post()
+        second = self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(IMAGE_STORAGE.is_hashed(first.image.name))
+        directory, files = IMAGE_STORAGE.listdir(
+            os.path.dirname(first.image.name)
+        )
+        self.assertEqual(files, [os.path.basename(first.image.name)])
+
+    def test_dedupe_images_command(self):
+        """Command renames old images by content and drops copies."""
+        content = self.create_post().image.read()
+        names = [
+            default_storage.save(f'posts/copy_{number}.png', ContentFile(
+                content
+            )) for number in range(2)
+        ]
+        Post.objects.bulk_create(
+            Post(text='Копия', author=self.user, image=name)
+            for name in names
+        )
+        call_command('dedupe_images', stdout=StringIO())
+        images = set(
+            Post.objects.filter(text='Копия').values_list('image', flat=True)
+        )
+        self.assertEqual(len(images), 1)
+        self.assertTrue(IMAGE_STORAGE.is_hashed(images.pop()))
+        for name in names:
+            with self.subTest(name=name):
+                self.assertFalse(default_storage.exists(name))
+
+    def test_thumbnails_resolved_in_one_lookup(self):
+        """Thumbnails of a page are found with one store lookup."""
+        for color in ('red', 'green', 'blue'):
+            self.create_post(color=color)
+        cache.clear()
+        posts = list(Post.objects.filter(author=self.user))
+        with self.assertNumQueries(1):
+            resolve_thumbnails(posts)
+        with self.assertNumQueries(0):
+            resolve_thumbnails(posts)
+        self.assertTrue(all(post.thumbnails for post in posts))
+
+    def test_warm_thumbnails_command(self):
+        """Command registers thumbnails missing from the store."""
+        post = self.create_post()
+        KVStore.objects.all().delete()
+        cache.clear()
+        resolve_thumbnails([post])
+        self.assertEqual(post.thumbnails, {})
+        call_command('warm_thumbnails', count=10, stdout=StringIO())
+        with self.assertNumQueries(0):
+            resolve_thumbnails([post])
+        self.assertIn('card', post.thumbnails)
@@ -0,0 +1,41 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+( AS \S+)?$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+def query_plan(sql: str) -> list:
+    """``EXPLAIN QUERY PLAN`` details of a query."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql: str) -> list:
+    """Full table scans and temporary sorts in the plan of a query."""
+    return [
+        detail for detail in query_plan(sql)
+        if FULL_SCAN.match(detail) or TEMP_SORT.search(detail)
+    ]
+
+
+class QueryPlanMixin:
+    """Check that every SELECT made in a block is served by an index."""
+
+    @contextmanager
+    def assertQueriesUseIndexes(self):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            problems = plan_problems(sql)
+            self.assertFalse(
+                problems,
+                f'Query is not served by an index: {problems}\n{sql}'
+            )
@@ -0,0 +1,123 @@
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class EagerThumbnailBackend(ThumbnailBackend):
+    """Create every ``POST_THUMBNAILS`` size of an image in one pass.
+
+    Names of thumbnails are the ones ``{% thumbnail %}`` would use, so
+    templates get their urls without touching the storage.
+    """
+
+    def _options(self, source, options: dict) -> dict:
+        """Complete options the same way ``get_thumbnail`` does."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail(self, file_, alias: str):
+        """Return a thumbnail of ``file_`` without creating it."""
+        geometry, options = settings.POST_THUMBNAILS[alias]
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry, self._options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def generate(self, file_, force: bool = False) -> list:
+        """Create missing thumbnails of ``file_``, return created ones.
+
+        Thumbnails that already exist are registered in the key-value
+        store if they are not there yet.
+        """
+        source = ImageFile(file_)
+        thumbnails = []
+        for alias, (geometry, options) in settings.POST_THUMBNAILS.items():
+            options = self._options(source, options)
+            thumbnail = ImageFile(
+                self._get_thumbnail_filename(source, geometry, options),
+                default.storage,
+            )
+            thumbnails.append((geometry, options, thumbnail))
+        missing = [
+            item for item in thumbnails if force or not item[2].exists()
+        ]
+        if missing:
+            self._create_thumbnails(source, missing, force)
+        stored = default.kvstore.get_many(
+            [source] + [thumbnail for _, _, thumbnail in thumbnails]
+        )
+        if source.key not in stored:
+            default.kvstore.set(source)
+        for _, _, thumbnail in thumbnails:
+            if force or thumbnail.key not in stored:
+                default.kvstore.set(thumbnail, source)
+        return [thumbnail for _, _, thumbnail in missing]
+
+    def _create_thumbnails(self, source, missing: list, force: bool):
+        """Decode the source once for all missing thumbnails."""
+        if force:
+            default.kvstore.delete(source)
+        source_image = default.engine.get_image(source)
+        try:
+            image_info = default.engine.get_image_info(source_image)
+            source.set_size(default.engine.get_image_size(source_image))
+            for geometry, options, thumbnail in missing:
+                options['image_info'] = image_info
+                if force:
+                    thumbnail.delete()
+                self._create_thumbnail(
+                    source_image, geometry, options, thumbnail
+                )
+                self._create_alternative_resolutions(
+                    source_image, geometry, options, thumbnail.name
+                )
+        finally:
+            default.engine.cleanup(source_image)
+
+
+class BatchedKVStore(KVStore):
+    """Cached database key-value store with batched lookups.
+
+    ``get_many`` reads all images of a feed page with one cache call and
+    at most one query for the images missing from the cache.
+    """
+
+    def get_many(self, image_files) -> dict:
+        """Stored image files by their keys, unknown ones are left out."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        if not keys:
+            return {}
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in values.items() if value != EMPTY_VALUE
+        }
+
+
+backend = EagerThumbnailBackend()
@@ -0,0 +1,147 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+
+
+def _entries(user_id: int, posts) -> list:
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        ) for post in posts
+    ]
+
+
+def fan_out(post: Post) -> int:
+    """Put a new post into timelines of all followers of its author.
+
+    Timelines of every batch are pruned right away, so they never grow
+    past ``TIMELINE_SIZE`` for long. Returns the amount of followers.
+    """
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    batch, total = [], 0
+    for user_id in followers:
+        batch.append(user_id)
+        if len(batch) >= BATCH_SIZE:
+            _fan_out_batch(post, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        _fan_out_batch(post, batch)
+    return total + len(batch)
+
+
+def _fan_out_batch(post: Post, user_ids: list) -> None:
+    entries = []
+    for user_id in user_ids:
+        entries.extend(_entries(user_id, [post]))
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    prune(*user_ids)
+
+
+def _prune_sql(users: int) -> str:
+    """``DELETE`` of entries ranked past the cap, every timeline ranked
+    once."""
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    return (
+        f'DELETE FROM {table} WHERE id IN ('
+        'SELECT id FROM ('
+        'SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id '
+        'ORDER BY pub_date DESC, post_id DESC) AS position '
+        f'FROM {table} '
+        f'WHERE user_id IN ({", ".join(["%s"] * users)})'
+        ') ranked WHERE position > %s)'
+    )
+
+
+def prune(*user_ids: int) -> None:
+    """Keep only ``TIMELINE_SIZE`` newest entries of timelines.
+
+    Only timelines over the cap are ranked, by one statement.
+    """
+    full = list(TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).order_by().values('user_id').annotate(
+        total=Count('id')
+    ).filter(
+        total__gt=settings.TIMELINE_SIZE
+    ).values_list('user_id', flat=True))
+    if not full:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _prune_sql(len(full)), [*full, settings.TIMELINE_SIZE]
+        )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Add recent posts of a newly followed author to a timeline."""
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'pub_date'
+    )[:settings.TIMELINE_SIZE]
+    TimelineEntry.objects.bulk_create(
+        _entries(user_id, posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    prune(user_id)
+
+
+def remove_author(user_id: int, author_id: int) -> None:
+    """Drop posts of an unfollowed author from a timeline.
+
+    Older posts of the other authors may have been pruned to make room
+    for them, so the timeline is refilled.
+    """
+    deleted, _ = TimelineEntry.objects.filter(
+        user_id=user_id,
+        author_id=author_id,
+    ).delete()
+    if deleted:
+        rebuild(user_id)
+
+
+def change_author(post_id: int, author_id: int) -> None:
+    """Keep the author of timeline entries in step with their post."""
+    TimelineEntry.objects.filter(post_id=post_id).update(author_id=author_id)
+
+
+def _rebuild_sql(users: int) -> str:
+    """``INSERT ... SELECT`` of the newest posts of followed authors."""
+    quote = connection.ops.quote_name
+    return (
+        f'INSERT INTO {quote(TimelineEntry._meta.db_table)} '
+        '(user_id, post_id, author_id, pub_date) '
+        'SELECT user_id, id, author_id, pub_date FROM ('
+        'SELECT follow.user_id, post.id, post.author_id, post.pub_date, '
+        'ROW_NUMBER() OVER (PARTITION BY follow.user_id '
+        'ORDER BY post.pub_date DESC, post.id DESC) AS position '
+        f'FROM {quote(Follow._meta.db_table)} follow '
+        f'JOIN {quote(Post._meta.db_table)} post '
+        'ON post.author_id = follow.author_id '
+        f'WHERE follow.user_id IN ({", ".join(["%s"] * users)})'
+        ') ranked WHERE position <= %s'
+    )
+
+
+def rebuild(*user_ids: int) -> int:
+    """Fill timelines from scratch, return the amount of entries.
+
+    All given timelines are written by one statement, keep their amount
+    within ``BATCH_SIZE``.
+    """
+    TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _rebuild_sql(len(user_ids)),
+            [*user_ids, settings.TIMELINE_SIZE],
+        )
+        return cursor.rowcount
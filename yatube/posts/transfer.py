@@ -0,0 +1,233 @@
+"""Streaming JSONL export and import of posts, comments and follows.
+
+Every line is an object with a ``type``; groups and users go first, so
+that posts, comments and follows may refer to them by slug and username.
+Posts keep their ids, comments refer to them by these ids, so posts are
+imported only into a database without any. Images are exported by
+name, files are expected in the storage of the target.
+"""
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _dumps(row: dict) -> str:
+    return json.dumps(row, ensure_ascii=False, default=str)
+
+
+def export_rows(chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield JSONL lines of all exported objects, reading in chunks."""
+    for row in Group.objects.order_by('pk').values(
+        'slug', 'title', 'description'
+    ).iterator(chunk_size):
+        yield _dumps({'type': 'group', **row})
+    for row in User.objects.order_by('pk').values(
+        'username', 'first_name', 'last_name', 'email'
+    ).iterator(chunk_size):
+        yield _dumps({'type': 'user', **row})
+    posts = Post.objects.order_by('pk').values(
+        'id', 'text', 'pub_date', 'image', 'processed_image',
+        'author__username', 'group__slug',
+    )
+    for row in posts.iterator(chunk_size):
+        yield _dumps({
+            'type': 'post',
+            'id': row['id'],
+            'text': row['text'],
+            'pub_date': row['pub_date'].isoformat(),
+            'author': row['author__username'],
+            'group': row['group__slug'],
+            'image': row['image'],
+            'processed_image': row['processed_image'],
+        })
+    comments = Comment.objects.order_by('pk').values(
+        'post_id', 'text', 'created', 'author__username'
+    )
+    for row in comments.iterator(chunk_size):
+        yield _dumps({
+            'type': 'comment',
+            'post': row['post_id'],
+            'text': row['text'],
+            'created': row['created'].isoformat(),
+            'author': row['author__username'],
+        })
+    follows = Follow.objects.exclude(author=None).order_by('pk').values(
+        'user__username', 'author__username'
+    )
+    for row in follows.iterator(chunk_size):
+        yield _dumps({
+            'type': 'follow',
+            'user': row['user__username'],
+            'author': row['author__username'],
+        })
+
+
+def reset_sequences(*models) -> None:
+    """Continue ids after explicitly inserted ones where sequences exist."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+_in_bulk_command = False
+
+
+def bulk_command(handle):
+    """Let ``handle`` of a management command use ``original_dates``."""
+    @wraps(handle)
+    def wrapper(*args, **kwargs):
+        global _in_bulk_command
+        _in_bulk_command = True
+        try:
+            return handle(*args, **kwargs)
+        finally:
+            _in_bulk_command = False
+    return wrapper
+
+
+@contextmanager
+def original_dates():
+    """Let ``bulk_create`` keep dates of ``auto_now_add`` fields.
+
+    Only for management commands marked with ``bulk_command``: the
+    fields are shared by the whole process, so a post created meanwhile
+    by a server in it would get no date. Raises ``RuntimeError``
+    anywhere else.
+    """
+    if not _in_bulk_command:
+        raise RuntimeError(
+            'original_dates() runs only in a bulk_command.'
+        )
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class TargetNotEmpty(Exception):
+    """Imported post ids would clash with existing posts."""
+
+
+class Importer:
+    """Insert JSONL rows with ``bulk_create`` in chunks of one type."""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, report=None):
+        self.chunk_size = chunk_size
+        self.report = report
+        self.counts = {}
+        self.started = None
+
+    def run(self, lines) -> dict:
+        """Import lines, return amounts of rows by type.
+
+        Raises ``TargetNotEmpty`` before reading if posts already exist.
+        """
+        if Post.objects.exists():
+            raise TargetNotEmpty('Posts already exist in the database.')
+        self.started = time.monotonic()
+        chunk, kind = [], None
+        with original_dates():
+            for line in lines:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if chunk and (row['type'] != kind
+                              or len(chunk) >= self.chunk_size):
+                    self.flush(kind, chunk)
+                    chunk = []
+                kind = row['type']
+                chunk.append(row)
+            if chunk:
+                self.flush(kind, chunk)
+        reset_sequences(Post)
+        return self.counts
+
+    def flush(self, kind: str, rows: list) -> None:
+        with transaction.atomic():
+            getattr(self, f'insert_{kind}s')(rows)
+        self.counts[kind] = self.counts.get(kind, 0) + len(rows)
+        if self.report:
+            total = sum(self.counts.values())
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            self.report(
+                f'{kind}: {self.counts[kind]}, '
+                f'{total / elapsed:.0f} rows/s'
+            )
+
+    def user_ids(self, rows, *fields) -> dict:
+        names = {row[field] for row in rows for field in fields}
+        return dict(User.objects.filter(
+            username__in=names
+        ).values_list('username', 'pk'))
+
+    def insert_groups(self, rows):
+        Group.objects.bulk_create(
+            [Group(**{key: row[key] for key in (
+                'slug', 'title', 'description'
+            )}) for row in rows],
+            ignore_conflicts=True,
+        )
+
+    def insert_users(self, rows):
+        User.objects.bulk_create(
+            [User(
+                username=row['username'],
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                email=row['email'],
+                password=make_password(None),
+            ) for row in rows],
+            ignore_conflicts=True,
+        )
+
+    def insert_posts(self, rows):
+        authors = self.user_ids(rows, 'author')
+        groups = dict(Group.objects.filter(
+            slug__in={row['group'] for row in rows if row['group']}
+        ).values_list('slug', 'pk'))
+        Post.objects.bulk_create(Post(
+            id=row['id'],
+            text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+            author_id=authors[row['author']],
+            group_id=groups.get(row['group']),
+            image=row['image'],
+            processed_image=row['processed_image'],
+        ) for row in rows)
+
+    def insert_comments(self, rows):
+        authors = self.user_ids(rows, 'author')
+        Comment.objects.bulk_create(Comment(
+            post_id=row['post'],
+            text=row['text'],
+            created=parse_datetime(row['created']),
+            author_id=authors[row['author']],
+        ) for row in rows)
+
+    def insert_follows(self, rows):
+        users = self.user_ids(rows, 'user', 'author')
+        Follow.objects.bulk_create(
+            [Follow(
+                user_id=users[row['user']],
+                author_id=users[row['author']],
+            ) for row in rows],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,140 @@
+"""Trending posts and groups from hourly activity counters.
+
+Every comment counts for its post and group, every new post for its
+group. An event adds to the bucket of its object and hour and to the
+scores of all windows at once, so rankings are read from an index.
+``compact`` subtracts buckets that left a window from its scores and
+deletes buckets older than the longest window.
+"""
+import datetime
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from core.cache import bump_version
+
+from .models import Group, Post, TrendBucket, TrendScore
+
+# Name: title, length and score field, from the shortest window.
+WINDOWS = {
+    '1h': ('За час', datetime.timedelta(hours=1), 'score_1h'),
+    '24h': ('За сутки', datetime.timedelta(days=1), 'score_24h'),
+    '7d': ('За неделю', datetime.timedelta(days=7), 'score_7d'),
+}
+DEFAULT_WINDOW = '24h'
+
+TRENDING_KEY = 'trending:{}'
+
+
+def hour_start(moment: datetime.datetime) -> datetime.datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record(*objects, moment=None) -> None:
+    """Count an event of ``(kind, object_id)`` objects.
+
+    Missing rows are inserted empty first, so the increments are plain
+    updates and concurrent events are never lost.
+    """
+    start = hour_start(moment or timezone.now())
+    TrendBucket.objects.bulk_create([
+        TrendBucket(kind=kind, object_id=object_id, start=start)
+        for kind, object_id in objects
+    ], ignore_conflicts=True)
+    TrendScore.objects.bulk_create([
+        TrendScore(kind=kind, object_id=object_id)
+        for kind, object_id in objects
+    ], ignore_conflicts=True)
+    match = reduce(or_, (
+        Q(kind=kind, object_id=object_id) for kind, object_id in objects
+    ))
+    TrendBucket.objects.filter(match, start=start).update(
+        count=F('count') + 1
+    )
+    TrendScore.objects.filter(match).update(**{
+        field: F(field) + 1 for _, _, field in WINDOWS.values()
+    })
+
+
+def _top(kind: str, queryset, field: str) -> list:
+    """Objects with the best scores, best first."""
+    scores = list(TrendScore.objects.filter(
+        kind=kind, **{f'{field}__gt': 0}
+    ).order_by(f'-{field}', 'object_id').values_list(
+        'object_id', field
+    )[:settings.TRENDING_SIZE])
+    objects = queryset.in_bulk([object_id for object_id, _ in scores])
+    top = []
+    for object_id, score in scores:
+        if object_id in objects:
+            objects[object_id].trend_score = score
+            top.append(objects[object_id])
+    return top
+
+
+def trending(window: str = DEFAULT_WINDOW) -> dict:
+    """Top ``posts`` and ``groups`` of a window, cached for
+    ``TRENDING_CACHE_TIMEOUT``."""
+    key = TRENDING_KEY.format(window)
+    result = cache.get(key)
+    if result is None:
+        field = WINDOWS[window][2]
+        result = {
+            'posts': _top(
+                TrendBucket.POST,
+                Post.objects.select_related('author', 'group'),
+                field,
+            ),
+            'groups': _top(TrendBucket.GROUP, Group.objects.all(), field),
+        }
+        cache.set(key, result, settings.TRENDING_CACHE_TIMEOUT)
+    return result
+
+
+@transaction.atomic
+def _retire(position: int, boundary, field: str) -> int:
+    """Subtract buckets started before ``boundary`` from a window."""
+    leaving = TrendBucket.objects.filter(
+        retired=position, start__lt=boundary
+    )
+    totals = leaving.order_by().values_list('kind', 'object_id').annotate(
+        total=Sum('count')
+    )
+    retired = 0
+    for kind, object_id, total in totals.iterator():
+        TrendScore.objects.filter(kind=kind, object_id=object_id).update(
+            **{field: F(field) - total}
+        )
+        retired += 1
+    leaving.update(retired=position + 1)
+    return retired
+
+
+def compact(moment=None) -> dict:
+    """Move scores along with time and drop buckets out of all windows.
+
+    Returns amounts of objects whose score changed, by window, and of
+    deleted buckets. Changed scores drop cached rankings and pages with
+    the sidebar.
+    """
+    # Signals import this module.
+    from .signals import INDEX_PAGE
+
+    moment = moment or timezone.now()
+    report = {}
+    for position, (name, (_, period, field)) in enumerate(WINDOWS.items()):
+        report[name] = _retire(position, hour_start(moment - period), field)
+    if any(report.values()):
+        cache.delete_many([TRENDING_KEY.format(name) for name in WINDOWS])
+        bump_version(INDEX_PAGE)
+    report['deleted'], _ = TrendBucket.objects.filter(
+        retired=len(WINDOWS)
+    ).delete()
+    longest = list(WINDOWS.values())[-1][2]
+    TrendScore.objects.filter(**{f'{longest}__lte': 0}).delete()
+    return report
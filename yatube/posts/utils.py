@@ -1,10 +1,281 @@
-from django.core.paginator import Paginator
+import base64
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 from yatube.settings import POST_PER_PAGE
 
+NEXT = 'n'
+PREVIOUS = 'p'
+LAST = 'l'
+
+
+class InvalidCursor(Exception):
+    """Cursor token can not be decoded."""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep microseconds, otherwise the keyset condition skips records."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def pages_in(rows: int, per_page: int) -> int:
+    return -(-rows // per_page)
+
+
+class CursorPage(Page):
+    """Page of a keyset paginator.
+
+    Its number is carried along in cursors, pages around it are known
+    only within the paginator window.
+    """
+
+    def __init__(self, object_list, number, paginator, bounds=(None, None),
+                 pages_before=0, pages_after=0):
+        super().__init__(object_list, number, paginator)
+        self._first, self._last = bounds
+        self.pages_before = pages_before
+        self.pages_after = pages_after
+
+    def __repr__(self):
+        return f'<Page {self.number} (cursor)>'
+
+    def has_next(self):
+        return self.pages_after > 0
+
+    def has_previous(self):
+        return self.pages_before > 0
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def _cursor_after(self, pages: int) -> str:
+        return self.paginator.encode_cursor(
+            NEXT, self._last, self.number + pages,
+            (pages - 1) * self.paginator.per_page,
+        )
+
+    def _cursor_before(self, pages: int) -> str:
+        return self.paginator.encode_cursor(
+            PREVIOUS, self._first, self.number - pages,
+            (pages - 1) * self.paginator.per_page,
+        )
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next() and self._last):
+            return None
+        return self._cursor_after(1)
+
+    @property
+    def previous_cursor(self):
+        if not (self.has_previous() and self._first):
+            return None
+        return self._cursor_before(1)
 
-def page_counter(request, posts: object) -> Paginator:
+    @property
+    def last_cursor(self):
+        return self.paginator.encode_cursor(LAST)
+
+    @property
+    def window(self) -> list:
+        """``(number, cursor)`` of pages around the current one."""
+        if not self.object_list:
+            return []
+        before = [
+            (self.number - pages, self._cursor_before(pages))
+            for pages in range(self.pages_before, 0, -1)
+        ]
+        after = [
+            (self.number + pages, self._cursor_after(pages))
+            for pages in range(1, self.pages_after + 1)
+        ]
+        return before + [(self.number, None)] + after
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator.
+
+    Records are ordered by ``keys`` descending (``pub_date``, ``id`` by
+    default), a page is selected with an indexed range condition instead
+    of ``OFFSET`` and the total amount of records is only estimated.
+    If ``related`` is set, the page holds that attribute of every record
+    instead of the record itself. A known ``count`` replaces the estimate.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 related=None, window=None, count=None):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.related = related
+        self.window = (
+            settings.PAGINATOR_WINDOW if window is None else window
+        )
+        if count is not None:
+            self.count = count
+
+    @cached_property
+    def count(self) -> int:
+        """Estimated amount of records.
+
+        Counted once per ``ESTIMATED_COUNT_TIMEOUT`` for every queryset.
+        """
+        query = str(self.object_list.query).encode()
+        key = f'estimated_count:{hashlib.md5(query).hexdigest()}'
+        return cache.get_or_set(
+            key, self.object_list.count, settings.ESTIMATED_COUNT_TIMEOUT
+        )
+
+    def key_values(self, obj) -> list:
+        return [getattr(obj, key) for key in self.keys]
+
+    def encode_cursor(self, direction: str, values=(), number: int = 0,
+                      skip: int = 0) -> str:
+        data = json.dumps(
+            [direction, list(values), number, skip], cls=CursorEncoder
+        )
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values, number, skip = json.loads(data)
+            if direction not in (NEXT, PREVIOUS, LAST):
+                raise ValueError(direction)
+            if direction != LAST and len(values) != len(self.keys):
+                raise ValueError(values)
+            number, skip = int(number), int(skip)
+            if not 0 <= skip < self.per_page * max(self.window, 1):
+                raise ValueError(skip)
+            values = [
+                self._to_python(key, value)
+                for key, value in zip(self.keys, values)
+            ]
+        except Exception as error:
+            raise InvalidCursor(cursor) from error
+        return direction, values, number, skip
+
+    def _to_python(self, key: str, value):
+        """Convert a cursor value back; annotations stay JSON values."""
+        try:
+            field = self.object_list.model._meta.get_field(key)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def _keyset_filter(self, values, lookup: str) -> Q:
+        """Build ``(k1, k2, ...) <lookup> (v1, v2, ...)`` condition."""
+        condition = Q()
+        for position in reversed(range(len(self.keys))):
+            equal = {
+                key: value for key, value
+                in zip(self.keys[:position], values[:position])
+            }
+            step = Q(**equal, **{
+                f'{self.keys[position]}__{lookup}': values[position]
+            })
+            condition = step if not condition else step | condition
+        return condition
+
+    def _descending(self) -> list:
+        return [f'-{key}' for key in self.keys]
+
+    def _pages_after(self, values) -> int:
+        """Amount of pages within the window after a record."""
+        rows = self.object_list.filter(
+            self._keyset_filter(values, 'lt')
+        ).order_by(*self._descending()).values_list(self.keys[-1])
+        return pages_in(
+            len(rows[:self.per_page * self.window]), self.per_page
+        )
+
+    def page(self, cursor: str = None) -> CursorPage:
+        direction, values, number, skip = (
+            self.decode_cursor(cursor) if cursor else (None, [], 1, 0)
+        )
+        queryset = self.object_list
+        if direction == NEXT:
+            queryset = queryset.filter(self._keyset_filter(values, 'lt'))
+        elif direction == PREVIOUS:
+            queryset = queryset.filter(self._keyset_filter(values, 'gt'))
+        reverse = direction in (PREVIOUS, LAST)
+        queryset = queryset.order_by(
+            *(self.keys if reverse else self._descending())
+        )
+        limit = self.per_page * (self.window + 1) + 1
+        rows = list(queryset[skip:skip + limit])
+        size = self.per_page
+        if direction == LAST:
+            # The last page holds the remainder, so pages before it line
+            # up with the ones counted from the first page.
+            size = self.count - (self.num_pages - 1) * self.per_page
+            size = min(max(size, 1), self.per_page)
+        records = rows[:size]
+        pages_ahead = min(
+            self.window,
+            pages_in(len(rows) - len(records), self.per_page),
+        )
+        if reverse:
+            records.reverse()
+        bounds = (
+            (self.key_values(records[0]), self.key_values(records[-1]))
+            if records else (None, None)
+        )
+        if reverse:
+            pages_before, pages_after = pages_ahead, 0
+            if direction == LAST:
+                number = self.num_pages
+            elif records:
+                pages_after = max(1, self._pages_after(bounds[1]))
+        else:
+            pages_before = min(self.window, number - 1) if direction else 0
+            pages_after = pages_ahead
+        if self.related:
+            records = [getattr(record, self.related) for record in records]
+        return CursorPage(
+            records, max(number, pages_before + 1), self,
+            bounds=bounds,
+            pages_before=pages_before,
+            pages_after=pages_after,
+        )
+
+    def get_page(self, cursor: str = None) -> CursorPage:
+        """Return a page, falling back to the first one on a bad cursor."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def page_counter(request, posts: object, **options) -> CursorPage:
     """Retrieve paginator"""
-    paginator = Paginator(posts, per_page=POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, per_page=POST_PER_PAGE, **options)
+    cursor = request.GET.get('cursor')
+    return paginator.get_page(cursor)
+
+
+def comment_page(request, post) -> CursorPage:
+    """Retrieve a page of comments of a post, newest first."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        per_page=settings.COMMENTS_PER_PAGE,
+        keys=('created', 'id'),
+        window=1,
+        count=post.comments_count,
+    )
+    return paginator.get_page(request.GET.get('cursor'))
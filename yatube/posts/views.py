@@ -1,14 +1,67 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
-from .forms import CommentForm, PostForm
+from core.cache import versioned_cache_page, versioned_condition
+from core.query_budget import query_budget
+
+from . import graph, search, trending
+from .counters import stats_of
+from .recommendations import RECOMMENDATIONS, recommended_authors
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Follow, Group, Post, User
-from .utils import page_counter
+from .signals import INDEX_PAGE
+from .utils import comment_page, page_counter
+
+
+def page_namespaces(request, *args, **kwargs) -> list:
+    """Namespaces of a page, the header and buttons depend on the user."""
+    if request.user.is_authenticated:
+        return [INDEX_PAGE, f'timeline:{request.user.pk}']
+    return [INDEX_PAGE]
+
+
+def profile_namespaces(request, *args, **kwargs) -> list:
+    """Namespaces of a profile, the viewer also gets suggestions."""
+    namespaces = page_namespaces(request)
+    if request.user.is_authenticated:
+        namespaces.append(RECOMMENDATIONS)
+    return namespaces
+
+
+def profile_author(request, username: str) -> User:
+    """Author of a profile page, loaded once per request."""
+    if not hasattr(request, 'profile_author'):
+        request.profile_author = get_object_or_404(
+            User.objects.select_related('stats'),
+            username=username,
+        )
+    return request.profile_author
 
 
-@cache_page(20, key_prefix='index_page')
+def profile_node(request, username: str) -> graph.Node:
+    """Follow counters of an author and the viewer's follow state."""
+    if not hasattr(request, 'profile_node'):
+        request.profile_node = graph.lookup(
+            profile_author(request, username), request.user.pk
+        )
+    return request.profile_node
+
+
+def profile_state(request, username: str) -> tuple:
+    """Counters of an author, changed by follows of other users."""
+    node = profile_node(request, username)
+    return (
+        stats_of(profile_author(request, username)).posts_count,
+        node.followers,
+        node.following,
+    )
+
+
+@query_budget(10)
+@versioned_condition(page_namespaces)
+@versioned_cache_page(settings.INDEX_CACHE_TIMEOUT, key_prefix='index_page')
 def index(request) -> HttpResponse:
     template = 'posts/index.html'
     posts = Post.objects.all().select_related('group', 'author')
@@ -19,6 +72,8 @@ def index(request) -> HttpResponse:
     return render(request, template, context)
 
 
+@query_budget(7)
+@versioned_condition(page_namespaces)
 def group_posts(request, slug: str) -> HttpResponse:
     """Retrive posts of certain group."""
     template = 'posts/group_list.html'
@@ -32,40 +87,97 @@ def group_posts(request, slug: str) -> HttpResponse:
     return render(request, template, context)
 
 
+@query_budget(8)
+@versioned_condition(profile_namespaces, profile_state)
 def profile(request, username: str) -> HttpResponse:
     """Retrive posts of certain author."""
-    author = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
+    author = profile_author(request, username)
+    node = profile_node(request, username)
     posts = author.posts.all().select_related('group')
     page_obj = page_counter(request, posts)
-    posts_quantity = author.posts.all().count()
     context = {
         'page_obj': page_obj,
-        'posts_quantity': posts_quantity,
+        'posts_quantity': stats_of(author).posts_count,
+        'followers_quantity': node.followers,
+        'following_quantity': node.following,
         'author': author,
-        'following': following,
+        'following': node.followed,
+        'recommendations': recommended_authors(request.user, author),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(5)
+@versioned_condition(page_namespaces)
 def post_detail(request, post_id: int) -> HttpResponse:
     """Retrive certain post."""
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id,
+    )
     comment_form = CommentForm()
-    posts_quantity = post.author.posts.all().count()
     context = {
         'post': post,
-        'posts_quantity': posts_quantity,
+        'posts_quantity': stats_of(post.author).posts_count,
         'form': comment_form,
+        'comments': comment_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(2)
+def post_comments(request, post_id: int) -> HttpResponse:
+    """Next batch of comments of a post as a page fragment."""
+    post = get_object_or_404(
+        Post.objects.only('id', 'comments_count'), pk=post_id
+    )
+    context = {
+        'post': post,
+        'comments': comment_page(request, post),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+@query_budget(6)
+def trending_index(request) -> HttpResponse:
+    """Posts and groups with the most activity in a window."""
+    window = request.GET.get('window')
+    if window not in trending.WINDOWS:
+        window = trending.DEFAULT_WINDOW
+    context = {
+        'window': window,
+        'windows': trending.WINDOWS,
+        'trending': trending.trending(window),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@query_budget(6)
+def post_search(request) -> HttpResponse:
+    """Full-text search of posts."""
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid() and form.cleaned_data['q']:
+        posts = Post.objects.select_related('author', 'group')
+        if form.cleaned_data['group']:
+            posts = posts.filter(group__slug=form.cleaned_data['group'])
+        if form.cleaned_data['author']:
+            posts = posts.filter(
+                author__username=form.cleaned_data['author']
+            )
+        posts = search.search(posts, form.cleaned_data['q'])
+        page_obj = page_counter(request, posts, keys=('score', 'id'))
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query_string': query.urlencode(),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(11)
 @login_required
 def post_create(request) -> HttpResponse:
     """New post creation."""
@@ -82,6 +194,7 @@ def post_create(request) -> HttpResponse:
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(7)
 @login_required
 def post_edit(request, post_id: int) -> HttpResponse:
     """Post changing."""
@@ -100,6 +213,7 @@ def post_edit(request, post_id: int) -> HttpResponse:
                   {'form': form, 'is_edit': True})
 
 
+@query_budget(9)
 @login_required
 def add_comment(request, post_id: int) -> HttpResponse:
     """Comment creation."""
@@ -113,17 +227,24 @@ def add_comment(request, post_id: int) -> HttpResponse:
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
 def follow_index(request) -> HttpResponse:
     """Retrive posts of favorite authors."""
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = page_counter(request, posts)
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = page_counter(
+        request, entries, keys=('pub_date', 'post_id'), related='post'
+    )
     context = {
         'page_obj': page_obj,
+        'recommendations': recommended_authors(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(11)
 @login_required
 def profile_follow(request, username) -> HttpResponse:
     """Follow an author."""
@@ -141,11 +262,13 @@ def profile_follow(request, username) -> HttpResponse:
     return redirect('posts:profile', username)
 
 
+@query_budget(8)
 @login_required
 def profile_unfollow(request, username):
     """Unfollow an author."""
     author = get_object_or_404(User, username=username)
-    Follow.objects.get(
+    get_object_or_404(
+        Follow,
         user=request.user,
         author=author,
     ).delete()
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+User = get_user_model()
+
+USER_KEY = 'user:{}'
+
+
+def user_key(user_id) -> str:
+    return USER_KEY.format(user_id)
+
+
+def forget_user(user_id) -> None:
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """Load the user of a session from the cache.
+
+    The entry is dropped when the user is saved, deleted or logs out,
+    so a changed password invalidates sessions right away. Other
+    processes see that only through a shared cache: without
+    ``SHARED_CACHE`` users are read from the database every time.
+    """
+
+    def get_user(self, user_id):
+        if not settings.SHARED_CACHE:
+            return super().get_user(user_id)
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User._default_manager.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .backends import user_key
+
+User = get_user_model()
+
+
+@override_settings(
+    SHARED_CACHE=True,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class CachedUserTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='auth', password='old-password'
+        )
+        self.client = Client()
+        self.client.login(username='auth', password='old-password')
+        self.url = reverse('about:author')
+
+    def test_session_and_user_come_from_cache(self):
+        """Repeated requests read neither sessions nor users."""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'], self.user)
+        tables = ('django_session', 'auth_user')
+        for query in context.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertFalse(any(
+                    table in query['sql'] for table in tables
+                ))
+
+    def test_password_change_ends_sessions(self):
+        """Changed password invalidates the cached user."""
+        self.client.get(self.url)
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_logout_forgets_user(self):
+        """Logout drops the cached user."""
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+
+class UncachedUserTest(TestCase):
+    def test_user_is_not_cached_without_shared_cache(self):
+        """A per-process cache keeps neither users nor sessions."""
+        cache.clear()
+        user = User.objects.create_user(username='auth', password='secret')
+        client = Client()
+        client.login(username='auth', password='secret')
+        client.get(reverse('about:author'))
+        self.assertIsNone(cache.get(user_key(user.pk)))
+        with CaptureQueriesContext(connection) as context:
+            client.get(reverse('about:author'))
+        self.assertTrue(any(
+            'django_session' in query['sql']
+            for query in context.captured_queries
+        ))
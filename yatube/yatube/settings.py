@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -111,6 +113,41 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Processes of a WSGI server share a cache in this directory if it is set.
+CACHE_DIR = os.getenv('CACHE_DIR')
+# Without a shared cache an invalidation is seen only by the process
+# making it, so nothing may stay cached for long.
+SHARED_CACHE = bool(CACHE_DIR)
+if CACHE_DIR:
+    CACHES['default'] = {
+        'BACKEND': 'core.tiered_cache.TieredCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_INTERVAL': 100,
+            'LOCAL_MAX_ENTRIES': 1000,
+        },
+    }
+
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    # Sessions created before the cached backend still refer to this one.
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if SHARED_CACHE
+    else 'django.contrib.sessions.backends.db'
+)
+
+USER_CACHE_TIMEOUT = 60 * 60
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -119,13 +156,78 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POST_PER_PAGE = 10
 
+COMMENTS_PER_PAGE = 20
+
+PAGINATOR_WINDOW = 2
+
+ESTIMATED_COUNT_TIMEOUT = 60 * 10
+
+TIMELINE_SIZE = 1000
+
+# Versions of cached namespaces live forever in a shared cache. In a
+# per-process one they expire, so other processes pick up a change of
+# any versioned page, card or ETag within this time.
+VERSION_CACHE_TIMEOUT = None if SHARED_CACHE else 20
+
+INDEX_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 20
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+GRAPH_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 20
+
+RECOMMENDATIONS_TOP = 20
+
+RECOMMENDATIONS_SHOWN = 5
+
+RECOMMENDATIONS_SAMPLE = 20
+
+TRENDING_SIZE = 10
+
+TRENDING_SIDEBAR_SIZE = 5
+
+TRENDING_CACHE_TIMEOUT = 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+
+POST_IMAGE_QUALITY = 80
+
+POST_IMAGE_VARIANTS = ('avif', 'webp')
+
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BatchedKVStore'
+
+THUMBNAIL_WARM_COUNT = 1000
+
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# Background jobs run in a thread pool after the commit; tests run them
+# inline. Jobs still queued when the process stops are lost: images of
+# such posts are processed again by ``manage.py process_images``.
+BACKGROUND_WORKERS = int(
+    os.getenv('BACKGROUND_WORKERS', default=0 if TESTING else 4)
+)
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }